@@ -0,0 +1,290 @@
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# job.status: queued -> starting -> running -> stopped, or failed; "stopping" is a stop request
+QUEUED = "queued"
+STARTING = "starting"
+RUNNING = "running"
+STOPPING = "stopping"
+STOPPED = "stopped"
+FAILED = "failed"
+ACTIVE_STATUSES = (QUEUED, STARTING, RUNNING, STOPPING)
+# payload (with the LiveKit agent token) once a job has been claimed or cancelled
+_NO_PAYLOAD = "{}"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS agent_jobs (
+    session_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    worker_id TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS agent_jobs_status ON agent_jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS agent_workers (
+    worker_id TEXT PRIMARY KEY,
+    host TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    capacity INTEGER NOT NULL,
+    running INTEGER NOT NULL,
+    started_at REAL NOT NULL,
+    heartbeat_at REAL NOT NULL
+);
+"""
+
+
+class AgentQueue:
+    """Local queue of LiveAvatar agent jobs shared by the API and the agent worker processes.
+
+    A SQLite file (WAL mode) holds one row per LiveAvatar session and one per
+    worker. Workers claim queued jobs atomically and heartbeat; a worker
+    whose heartbeat is older than `stale_after` seconds is considered dead,
+    and `reap_stale()` ends its jobs (starting -> failed, otherwise stopped).
+
+    Every method does blocking SQLite I/O: call them from a thread
+    (`asyncio.to_thread`) when on an event loop.
+    """
+
+    def __init__(self, path: str, stale_after: float = 15.0):
+        self.path = path
+        self.stale_after = stale_after
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    def _tx(self):
+        return _Transaction(self._db, self._lock)
+
+    # --- API side ---
+
+    def enqueue(self, session_id: str, payload: Dict[str, Any]) -> bool:
+        """Queue a start unless the session already has a live job. Returns True if queued."""
+        now = time.time()
+        with self._tx() as db:
+            row = db.execute(
+                "SELECT j.status, w.heartbeat_at FROM agent_jobs j "
+                "LEFT JOIN agent_workers w ON w.worker_id = j.worker_id WHERE j.session_id = ?",
+                (session_id,),
+            ).fetchone()
+            if row is not None and row[0] in ACTIVE_STATUSES:
+                status, heartbeat_at = row
+                if status == QUEUED or (heartbeat_at or 0) > now - self.stale_after:
+                    return False
+            db.execute(
+                "INSERT OR REPLACE INTO agent_jobs (session_id, status, payload, worker_id, error, created_at, updated_at)"
+                " VALUES (?, ?, ?, NULL, NULL, ?, ?)",
+                (session_id, QUEUED, json.dumps(payload), now, now),
+            )
+            # finished jobs are only kept for a day, for debugging
+            db.execute("DELETE FROM agent_jobs WHERE status IN (?, ?) AND updated_at < ?", (STOPPED, FAILED, now - 86400))
+        return True
+
+    def request_stop(self, session_id: str) -> None:
+        with self._tx() as db:
+            db.execute(
+                "UPDATE agent_jobs SET status = CASE status WHEN ? THEN ? ELSE ? END, payload = ?, updated_at = ?"
+                " WHERE session_id = ? AND status IN (?, ?, ?)",
+                (QUEUED, STOPPED, STOPPING, _NO_PAYLOAD, time.time(), session_id, QUEUED, STARTING, RUNNING),
+            )
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT j.status, j.worker_id, j.error, w.heartbeat_at FROM agent_jobs j "
+                "LEFT JOIN agent_workers w ON w.worker_id = j.worker_id WHERE j.session_id = ?",
+                (session_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        status, worker_id, error, heartbeat_at = row
+        return {
+            "status": status,
+            "worker_id": worker_id,
+            "error": error,
+            "worker_alive": worker_id is not None and (heartbeat_at or 0) > time.time() - self.stale_after,
+        }
+
+    def live_workers(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT worker_id, host, pid, capacity, running, started_at, heartbeat_at FROM agent_workers"
+                " WHERE heartbeat_at > ? ORDER BY worker_id",
+                (time.time() - self.stale_after,),
+            ).fetchall()
+        keys = ("worker_id", "host", "pid", "capacity", "running", "started_at", "heartbeat_at")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM agent_jobs GROUP BY status").fetchall())
+        workers = self.live_workers()
+        return {
+            "path": self.path,
+            "jobs": counts,
+            "workers": workers,
+            "capacity": sum(w["capacity"] for w in workers),
+            "running": sum(w["running"] for w in workers),
+        }
+
+    # --- worker side ---
+
+    def heartbeat(self, worker_id: str, capacity: int, running: int, started_at: float) -> None:
+        with self._tx() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO agent_workers (worker_id, host, pid, capacity, running, started_at, heartbeat_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (worker_id, socket.gethostname(), os.getpid(), capacity, running, started_at, time.time()),
+            )
+
+    def release(self, worker_id: str) -> None:
+        """Worker shutdown: end its jobs and remove it from the pool."""
+        with self._tx() as db:
+            db.execute(
+                "UPDATE agent_jobs SET status = ?, updated_at = ? WHERE worker_id = ? AND status IN (?, ?, ?)",
+                (STOPPED, time.time(), worker_id, STARTING, RUNNING, STOPPING),
+            )
+            db.execute("DELETE FROM agent_workers WHERE worker_id = ?", (worker_id,))
+
+    def claim(self, worker_id: str, limit: int) -> List[Dict[str, Any]]:
+        if limit <= 0:
+            return []
+        with self._tx() as db:
+            rows = db.execute(
+                "SELECT session_id, payload FROM agent_jobs WHERE status = ? ORDER BY created_at LIMIT ?",
+                (QUEUED, limit),
+            ).fetchall()
+            now = time.time()
+            for session_id, _ in rows:
+                # the worker now holds the agent token; it is not kept at rest in the queue
+                db.execute(
+                    "UPDATE agent_jobs SET status = ?, worker_id = ?, payload = ?, updated_at = ? WHERE session_id = ?",
+                    (STARTING, worker_id, _NO_PAYLOAD, now, session_id),
+                )
+        return [{"session_id": session_id, **json.loads(payload)} for session_id, payload in rows]
+
+    def jobs_for(self, worker_id: str) -> Dict[str, str]:
+        """session_id -> status of the active jobs this worker owns."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT session_id, status FROM agent_jobs WHERE worker_id = ? AND status IN (?, ?, ?)",
+                (worker_id, STARTING, RUNNING, STOPPING),
+            ).fetchall()
+        return dict(rows)
+
+    def reap_stale(self) -> int:
+        """End the jobs of workers that stopped heartbeating and forget those workers."""
+        cutoff = time.time() - self.stale_after
+        with self._tx() as db:
+            cur = db.execute(
+                "UPDATE agent_jobs SET status = CASE status WHEN ? THEN ? ELSE ? END, error = ?, updated_at = ?"
+                " WHERE status IN (?, ?, ?) AND worker_id NOT IN"
+                " (SELECT worker_id FROM agent_workers WHERE heartbeat_at > ?)",
+                (STARTING, FAILED, STOPPED, "Agent worker stopped heartbeating.", time.time(),
+                 STARTING, RUNNING, STOPPING, cutoff),
+            )
+            db.execute("DELETE FROM agent_workers WHERE heartbeat_at <= ?", (cutoff,))
+            return cur.rowcount
+
+    def transition(self, session_id: str, worker_id: str, from_status: str, to_status: str,
+                   error: Optional[str] = None) -> bool:
+        """Move a job this worker owns from one status to another (no-op if it moved on meanwhile)."""
+        with self._tx() as db:
+            cur = db.execute(
+                "UPDATE agent_jobs SET status = ?, error = ?, updated_at = ?"
+                " WHERE session_id = ? AND worker_id = ? AND status = ?",
+                (to_status, error, time.time(), session_id, worker_id, from_status),
+            )
+            return cur.rowcount > 0
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT under the connection lock, so claims never race."""
+
+    def __init__(self, db: sqlite3.Connection, lock: threading.Lock):
+        self.db = db
+        self.lock = lock
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.lock.acquire()
+        try:
+            self.db.execute("BEGIN IMMEDIATE")
+        except BaseException:
+            self.lock.release()
+            raise
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.lock.release()
+
+
+class AgentDispatcher:
+    """Same interface as AgentManager, but agents run in the agent worker processes
+    (`python -m app.agent_worker`); the API only queues jobs and reads their status."""
+
+    def __init__(self, queue: AgentQueue, poll_interval: float = 0.5):
+        self.queue = queue
+        self.poll_interval = poll_interval
+
+    async def start(
+            self,
+            *,
+            livekit_url: str,
+            livekit_agent_token: str,
+            avatar_id: str,
+            session_id: str,
+            timeout: float = 20.0,
+            max_session_duration: Optional[float] = None,
+    ) -> None:
+        # the queue does SQLite I/O (and may wait on a worker's write lock): keep it off the loop
+        await asyncio.to_thread(self.queue.reap_stale)
+        if not await asyncio.to_thread(self.queue.live_workers):
+            raise RuntimeError("No agent workers are running (start them with `python -m app.agent_worker`).")
+        await asyncio.to_thread(self.queue.enqueue, session_id, {
+            "livekit_url": livekit_url,
+            "livekit_agent_token": livekit_agent_token,
+            "avatar_id": avatar_id,
+            "timeout": timeout,
+            "max_session_duration": max_session_duration,
+        })
+
+        deadline = time.monotonic() + timeout
+        while True:
+            job = await asyncio.to_thread(self.queue.get, session_id) or {}
+            status = job.get("status")
+            if status == RUNNING:
+                return
+            if status == FAILED:
+                raise RuntimeError(job.get("error") or "Agent failed to start.")
+            if status in (STOPPING, STOPPED, None):
+                raise RuntimeError("Agent was stopped before it connected.")
+            if time.monotonic() >= deadline:
+                await self.stop(session_id)
+                raise asyncio.TimeoutError()
+            await asyncio.sleep(self.poll_interval)
+
+    async def stop(self, session_id: str) -> None:
+        await asyncio.to_thread(self.queue.request_stop, session_id)
+
+    async def stop_all(self) -> None:
+        # agents belong to the worker processes and outlive API restarts
+        return None
+
+    def is_running(self, session_id: str) -> bool:
+        # blocking: the status endpoint is a sync handler and runs in the threadpool
+        job = self.queue.get(session_id)
+        return bool(job and job["status"] == RUNNING and job["worker_alive"])
+
+    def stats(self) -> dict:
+        return {"backend": "workers", **self.queue.stats()}
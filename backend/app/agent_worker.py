@@ -0,0 +1,186 @@
+"""LiveAvatar agent worker pool. Run from backend/, next to the API:
+
+    python -m app.agent_worker --processes 4 --capacity 25
+
+Every process claims agent jobs from the local queue (AGENT_QUEUE_PATH, see
+app/agent_queue.py), runs them with its own AgentManager and heartbeats, so
+RTC/media work never shares a process with HTTP handling. The API dispatches
+to the pool when AGENT_BACKEND=workers. A crashed process is restarted; once its
+heartbeat goes stale the other processes (or the next start) end its jobs.
+
+Environment:
+    AGENT_QUEUE_PATH            queue file shared with the API (default agent_queue.sqlite3)
+    AGENT_WORKER_PROCESSES      processes in the pool (default 1)
+    AGENT_WORKER_CAPACITY       concurrent agents per process (default 20)
+    AGENT_WORKER_POLL_SECONDS   how often a process checks for jobs and heartbeats (default 0.5)
+    AGENT_WORKER_STALE_SECONDS  heartbeat age after which a process counts as dead (default 15)
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import time
+import uuid
+from typing import Dict, Optional
+
+from app.agent_queue import FAILED, RUNNING, STARTING, STOPPED, STOPPING, AgentQueue
+
+AGENT_QUEUE_PATH = os.getenv("AGENT_QUEUE_PATH", "agent_queue.sqlite3")
+
+
+async def _run_job(queue: AgentQueue, manager, worker_id: str, job: dict) -> None:
+    session_id = job["session_id"]
+    try:
+        await manager.start(
+            livekit_url=job["livekit_url"],
+            livekit_agent_token=job["livekit_agent_token"],
+            avatar_id=job["avatar_id"],
+            session_id=session_id,
+            timeout=job.get("timeout") or 20.0,
+            max_session_duration=job.get("max_session_duration"),
+        )
+    except asyncio.TimeoutError:
+        await asyncio.to_thread(queue.transition, session_id, worker_id, STARTING, FAILED,
+                                "Agent did not connect in time.")
+    except Exception as e:
+        await asyncio.to_thread(queue.transition, session_id, worker_id, STARTING, FAILED, f"{type(e).__name__}: {e}")
+    else:
+        await asyncio.to_thread(queue.transition, session_id, worker_id, STARTING, RUNNING)
+
+
+async def _stop_job(queue: AgentQueue, manager, worker_id: str, session_id: str, status: Optional[str]) -> None:
+    await manager.stop(session_id)
+    if status is not None:
+        await asyncio.to_thread(queue.transition, session_id, worker_id, status, STOPPED)
+
+
+async def _heartbeat(queue: AgentQueue, manager, worker_id: str, capacity: int, started_at: float,
+                     interval: float) -> None:
+    """Own task, so a slow stop or claim never lets this worker look dead to its siblings."""
+    while True:
+        try:
+            await asyncio.to_thread(queue.heartbeat, worker_id, capacity, len(manager.sessions()), started_at)
+            # jobs of crashed siblings end here, so they do not stay "running" forever
+            await asyncio.to_thread(queue.reap_stale)
+        except Exception as e:
+            print(f"[WARN] Agent worker heartbeat failed: {e}")
+        await asyncio.sleep(interval)
+
+
+async def run_worker(queue: AgentQueue, capacity: int, poll_interval: float = 0.5) -> None:
+    """One pool process: claim jobs up to `capacity`, execute stops, heartbeat.
+
+    Queue calls go through a thread, so a sibling holding the SQLite write
+    lock never stalls the loop that carries the RTC agents. Starts and stops
+    run as tasks; the loop itself only reads the queue and dispatches.
+    """
+    from app.liveavatar_agent import AgentManager
+
+    manager = AgentManager()
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+    started_at = time.time()
+    starting: Dict[str, asyncio.Task] = {}
+    stopping: Dict[str, asyncio.Task] = {}
+
+    def _track(tasks: Dict[str, asyncio.Task], session_id: str, coro) -> None:
+        task = asyncio.create_task(coro)
+        tasks[session_id] = task
+        task.add_done_callback(lambda _: tasks.pop(session_id, None))
+
+    await asyncio.to_thread(queue.heartbeat, worker_id, capacity, 0, started_at)
+    heartbeat = asyncio.create_task(_heartbeat(queue, manager, worker_id, capacity, started_at, poll_interval))
+    print(f"[INFO] Agent worker {worker_id} ready (capacity {capacity}).")
+
+    try:
+        while True:
+            running = set(manager.sessions())
+            owned = await asyncio.to_thread(queue.jobs_for, worker_id)
+
+            for session_id, status in owned.items():
+                if session_id in stopping:
+                    continue
+                if status == STOPPING:
+                    _track(stopping, session_id, _stop_job(queue, manager, worker_id, session_id, STOPPING))
+                elif status == RUNNING and session_id not in running:
+                    # ended by itself (room closed, max duration reached, crash)
+                    await asyncio.to_thread(queue.transition, session_id, worker_id, RUNNING, STOPPED)
+
+            # jobs taken away from this worker (reaped after a stall) must not keep running here
+            for session_id in running - owned.keys() - starting.keys() - stopping.keys():
+                _track(stopping, session_id, _stop_job(queue, manager, worker_id, session_id, None))
+
+            free = capacity - len(running | starting.keys())
+            for job in await asyncio.to_thread(queue.claim, worker_id, free):
+                _track(starting, job["session_id"], _run_job(queue, manager, worker_id, job))
+
+            await asyncio.sleep(poll_interval)
+    finally:
+        heartbeat.cancel()
+        # handing the rooms back: the API sees these jobs as ended right away
+        await manager.stop_all()
+        await asyncio.to_thread(queue.release, worker_id)
+
+
+def _worker_main(path: str, capacity: int, poll_interval: float, stale_after: float) -> None:
+    queue = AgentQueue(path, stale_after=stale_after)
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(run_worker(queue, capacity, poll_interval))
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, task.cancel)
+    try:
+        loop.run_until_complete(task)
+    except asyncio.CancelledError:
+        pass
+    finally:
+        loop.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=int(os.getenv("AGENT_WORKER_PROCESSES", "1")))
+    parser.add_argument("--capacity", type=int, default=int(os.getenv("AGENT_WORKER_CAPACITY", "20")))
+    parser.add_argument("--poll", type=float, default=float(os.getenv("AGENT_WORKER_POLL_SECONDS", "0.5")))
+    parser.add_argument("--stale-after", type=float, default=float(os.getenv("AGENT_WORKER_STALE_SECONDS", "15")))
+    parser.add_argument("--queue", default=AGENT_QUEUE_PATH)
+    args = parser.parse_args()
+
+    worker_args = (args.queue, max(1, args.capacity), args.poll, args.stale_after)
+    if args.processes <= 1:
+        _worker_main(*worker_args)
+        return
+
+    # one process per slot, restarted if it dies, so a crashing agent only takes its own process down
+    ctx = multiprocessing.get_context("spawn")
+    stopping = False
+
+    def _spawn():
+        proc = ctx.Process(target=_worker_main, args=worker_args, daemon=False)
+        proc.start()
+        return proc
+
+    def _stop(*_):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    procs = [_spawn() for _ in range(args.processes)]
+    while not stopping:
+        time.sleep(1.0)
+        for i, proc in enumerate(procs):
+            if not proc.is_alive() and not stopping:
+                print(f"[WARN] Agent worker process {proc.pid} exited ({proc.exitcode}), restarting.")
+                procs[i] = _spawn()
+
+    for proc in procs:
+        if proc.is_alive():
+            proc.terminate()
+    for proc in procs:
+        proc.join(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
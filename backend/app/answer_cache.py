@@ -0,0 +1,166 @@
+import hashlib
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, List, Optional
+
+import numpy as np
+
+_WS_RE = re.compile(r"\s+")
+_OP_SPACING_RE = re.compile(r"\s*([+\-*/=^()<>])\s*")
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)?")
+
+
+def normalize_question(text: str) -> str:
+    """Canonical form used as the cache key: "  What is 2 + 2 ?" -> "what is 2+2"."""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    text = _OP_SPACING_RE.sub(r"\1", text)
+    text = _WS_RE.sub(" ", text).strip()
+    return text.rstrip(" ?!.").strip()
+
+
+def _cache_key(norm: str) -> str:
+    return hashlib.sha256(norm.encode("utf-8")).hexdigest()
+
+
+def _numbers(text: str) -> List[str]:
+    return sorted(_NUMBER_RE.findall(text))
+
+
+@dataclass
+class _Entry:
+    question: str
+    answer: str
+    expires_at: float
+    vector: Optional[np.ndarray] = field(default=None, repr=False)
+
+
+class AnswerCache:
+    """LRU + TTL cache of tutor answers keyed by normalized question text.
+
+    Lookups hit an exact tier first (sha256 of the normalized question). If an
+    embedding function is configured, a semantic tier then accepts the closest
+    cached question above `similarity`, but only when both questions contain
+    exactly the same numbers, so "2+2" can never be answered with "2+3".
+    """
+
+    def __init__(
+            self,
+            max_entries: int = 1024,
+            ttl_seconds: float = 24 * 3600,
+            embed_fn: Optional[Callable[[str], Awaitable[List[float]]]] = None,
+            similarity: float = 0.95,
+    ):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.embed_fn = embed_fn
+        self.similarity = similarity
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._vectors: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    async def lookup(self, question: str) -> Optional[str]:
+        norm = normalize_question(question)
+        key = _cache_key(norm)
+        self._evict_expired()
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.answer
+
+        if self.embed_fn is not None:
+            answer = await self._lookup_semantic(norm)
+            if answer is not None:
+                self.semantic_hits += 1
+                return answer
+
+        self.misses += 1
+        return None
+
+    async def store(self, question: str, answer: str) -> None:
+        if not answer or not answer.strip():
+            return
+        norm = normalize_question(question)
+        key = _cache_key(norm)
+        vector = None
+        if self.embed_fn is not None:
+            try:
+                vector = await self._embed(norm)
+            except Exception as e:
+                # the answer is already generated: keep it for exact matches only
+                print(f"[WARN] Answer cache embedding failed: {e}")
+        self._entries[key] = _Entry(
+            question=norm,
+            answer=answer,
+            expires_at=time.monotonic() + self.ttl_seconds,
+            vector=vector,
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._vectors.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.semantic_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "semantic": self.embed_fn is not None,
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.semantic_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+    async def _lookup_semantic(self, norm: str) -> Optional[str]:
+        try:
+            vector = await self._embed(norm)
+        except Exception as e:
+            print(f"[WARN] Answer cache embedding failed: {e}")
+            return None
+        if vector is None:
+            return None
+
+        numbers = _numbers(norm)
+        best_score, best_entry = 0.0, None
+        for entry in self._entries.values():
+            if entry.vector is None or _numbers(entry.question) != numbers:
+                continue
+            score = float(np.dot(vector, entry.vector))
+            if score > best_score:
+                best_score, best_entry = score, entry
+        if best_entry is not None and best_score >= self.similarity:
+            return best_entry.answer
+        return None
+
+    async def _embed(self, norm: str) -> Optional[np.ndarray]:
+        cached = self._vectors.get(norm)
+        if cached is not None:
+            self._vectors.move_to_end(norm)
+            return cached
+        raw = await self.embed_fn(norm)  # type: ignore[misc]
+        vector = np.asarray(raw, dtype=np.float32)
+        length = float(np.linalg.norm(vector))
+        if not length:
+            return None
+        vector /= length
+        self._vectors[norm] = vector
+        while len(self._vectors) > 256:
+            self._vectors.popitem(last=False)
+        return vector
+
+    def _evict_expired(self) -> None:
+        now = time.monotonic()
+        expired = [k for k, e in self._entries.items() if e.expires_at <= now]
+        for k in expired:
+            del self._entries[k]
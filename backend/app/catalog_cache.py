@@ -0,0 +1,86 @@
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Generic, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class RefreshingCache(Generic[T]):
+    """In-memory catalog with stale-while-revalidate refreshes.
+
+    `get()` always answers from memory. Once the value is older than
+    `ttl_seconds`, the next `get()` kicks off a background reload and keeps
+    serving the old value until it finishes. An empty or failed load never
+    replaces a good catalog; it is retried after `retry_seconds`.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            loader: Callable[[], List[T]],
+            ttl_seconds: float = 3600,
+            retry_seconds: float = 30,
+    ):
+        self.name = name
+        self.loader = loader
+        self.ttl_seconds = ttl_seconds
+        self.retry_seconds = retry_seconds
+        self._value: List[T] = []
+        self._lock = threading.Lock()
+        self._loaded = threading.Event()
+        self._refreshing = False
+        self._next_refresh_at = 0.0
+        self._refreshed_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def get(self, wait_first_load: float = 10.0) -> List[T]:
+        if time.monotonic() >= self._next_refresh_at:
+            self.refresh_in_background()
+        if not self._value and not self._loaded.is_set() and wait_first_load > 0:
+            # cold start: give the warm-up a moment rather than answering with nothing
+            self._loaded.wait(wait_first_load)
+        return self._value
+
+    def refresh_in_background(self) -> None:
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, name=f"catalog-{self.name}", daemon=True).start()
+
+    def status(self) -> dict:
+        age = time.time() - self._refreshed_at if self._refreshed_at else None
+        return {
+            "name": self.name,
+            "size": len(self._value),
+            "last_refresh": (
+                datetime.fromtimestamp(self._refreshed_at, tz=timezone.utc).isoformat()
+                if self._refreshed_at else None
+            ),
+            "age_seconds": round(age, 1) if age is not None else None,
+            "ttl_seconds": self.ttl_seconds,
+            "stale": age is None or age > self.ttl_seconds,
+            "refreshing": self._refreshing,
+            "last_error": self.last_error,
+        }
+
+    def _refresh(self) -> None:
+        try:
+            value = self.loader()
+            if value:
+                self._value = value
+                self._refreshed_at = time.time()
+                self._next_refresh_at = time.monotonic() + self.ttl_seconds
+                self.last_error = None
+            else:
+                self.last_error = "loader returned no items"
+                self._next_refresh_at = time.monotonic() + self.retry_seconds
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            self._next_refresh_at = time.monotonic() + self.retry_seconds
+            print(f"[WARN] Refreshing {self.name} catalog failed: {e}")
+        finally:
+            self._loaded.set()
+            with self._lock:
+                self._refreshing = False
@@ -0,0 +1,239 @@
+import asyncio
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+COMPLETED_STATUSES = {"completed", "complete", "success", "done", "finished"}
+FAILED_STATUSES = {"failed", "error", "canceled", "cancelled"}
+TERMINAL_STATUSES = {"completed", "failed"}
+
+
+def _stringify_err(v: Any) -> Optional[str]:
+    if v is None:
+        return None
+    if isinstance(v, str):
+        return v
+    # common HeyGen format: {"code": "...", "message": "..."}
+    if isinstance(v, dict):
+        msg = v.get("message") or v.get("msg")
+        code = v.get("code")
+        if code and msg:
+            return f"{code}: {msg}"
+        if msg:
+            return str(msg)
+        return str(v)
+    return str(v)
+
+
+def normalize_heygen_status(data: dict) -> Dict[str, Any]:
+    """Map a raw HeyGen video_status payload onto the fields of QuestionStatusResponse."""
+    status = (data.get("status") or "unknown").lower()
+    video_url = data.get("video_url") or data.get("url")
+    raw_error = data.get("error") or data.get("message")
+
+    out_status = status
+    if status in COMPLETED_STATUSES or (video_url and status not in FAILED_STATUSES):
+        out_status = "completed"
+    elif status in FAILED_STATUSES:
+        out_status = "failed"
+
+    return {
+        "status": out_status,
+        "video_url": video_url,
+        "error": raw_error,
+        "error_message": _stringify_err(raw_error),
+        "raw_status": data,
+    }
+
+
+@dataclass
+class VideoJob:
+    video_id: str
+    status: str = "pending"
+    video_url: Optional[str] = None
+    error: Optional[Any] = None
+    error_message: Optional[str] = None
+    raw_status: Optional[dict] = None
+    version: int = 0
+    created_at: float = field(default_factory=time.monotonic)
+    updated_at: float = field(default_factory=time.monotonic)
+    next_check_at: float = 0.0
+    interval: float = 0.0
+    # last failed status check, shown to clients while the job is still retried
+    last_error: Optional[str] = None
+    failures: int = 0
+    _changed: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def as_status(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "video_url": self.video_url,
+            "error": self.error,
+            "error_message": self.error_message or self.last_error,
+            "raw_status": self.raw_status,
+        }
+
+
+class HeyGenStatusPoller:
+    """One background loop that tracks every outstanding HeyGen render.
+
+    Clients read job state from the in-memory table (or subscribe to changes)
+    instead of each poll turning into an upstream request. HeyGen has no
+    batch status endpoint, so each tick fans out the checks that are due,
+    bounded by `max_concurrency`. A job's check interval starts at
+    `min_interval` and grows by `backoff` every time its status is unchanged,
+    up to `max_interval`; any change resets it. A check that fails with a 4xx
+    (unknown video_id, bad key) fails the job at once; other errors fail it
+    after `max_failures` consecutive attempts.
+    """
+
+    def __init__(
+            self,
+            fetch_status: Callable[[str], Awaitable[dict]],
+            *,
+            min_interval: float = 3.0,
+            max_interval: float = 30.0,
+            backoff: float = 1.5,
+            max_concurrency: int = 8,
+            tick: float = 1.0,
+            retention: float = 3600.0,
+            max_age: float = 2 * 3600.0,
+            max_failures: int = 5,
+            on_update: Optional[Callable[[VideoJob], None]] = None,
+    ):
+        self.fetch_status = fetch_status
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.tick = tick
+        self.retention = retention
+        self.max_age = max_age
+        self.max_failures = max(1, max_failures)
+        self.on_update = on_update
+        self._max_concurrency = max(1, max_concurrency)
+        self._jobs: Dict[str, VideoJob] = {}
+        # track() is also called from threadpool workers
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.upstream_calls = 0
+
+    def track(self, video_id: str) -> VideoJob:
+        with self._lock:
+            job = self._jobs.get(video_id)
+            if job is None:
+                job = VideoJob(video_id=video_id, interval=self.min_interval)
+                self._jobs[video_id] = job
+            return job
+
+    def get(self, video_id: str) -> Optional[VideoJob]:
+        return self._jobs.get(video_id)
+
+    async def wait_changed(self, video_id: str, seen_version: int) -> None:
+        job = self._jobs.get(video_id)
+        if job is None or job.version != seen_version:
+            return
+        await job._changed.wait()
+
+    def stats(self) -> dict:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return {
+            "tracked": len(jobs),
+            "pending": sum(1 for j in jobs if not j.done),
+            "upstream_calls": self.upstream_calls,
+        }
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        sem = asyncio.Semaphore(self._max_concurrency)
+
+        async def _check(job: VideoJob) -> None:
+            async with sem:
+                await self._check(job)
+
+        while True:
+            now = time.monotonic()
+            self._gc(now)
+            with self._lock:
+                due: List[VideoJob] = [j for j in self._jobs.values() if not j.done and j.next_check_at <= now]
+            if due:
+                await asyncio.gather(*(_check(j) for j in due))
+            await asyncio.sleep(self.tick)
+
+    async def _check(self, job: VideoJob) -> None:
+        self.upstream_calls += 1
+        try:
+            data = await self.fetch_status(job.video_id)
+        except Exception as e:
+            print(f"[WARN] HeyGen status check failed for video_id={job.video_id}: {e}")
+            self._fail_check(job, e)
+            return
+
+        job.failures = 0
+        job.last_error = None
+        new = normalize_heygen_status(data)
+        changed = (new["status"], new["video_url"]) != (job.status, job.video_url)
+        job.status = new["status"]
+        job.video_url = new["video_url"]
+        job.error = new["error"]
+        job.error_message = new["error_message"]
+        job.raw_status = new["raw_status"]
+        self._schedule(job, changed=changed)
+        if changed:
+            self._publish(job)
+
+    def _fail_check(self, job: VideoJob, e: Exception) -> None:
+        job.failures += 1
+        job.last_error = f"HeyGen status check failed: {type(e).__name__}: {e}"
+        status_code = getattr(getattr(e, "response", None), "status_code", None)
+        client_error = status_code is not None and 400 <= status_code < 500 and status_code != 429
+        if client_error or job.failures >= self.max_failures:
+            job.status = "failed"
+            job.error_message = job.last_error
+            self._publish(job)
+            return
+        self._schedule(job, changed=False)
+
+    def _schedule(self, job: VideoJob, *, changed: bool) -> None:
+        if changed:
+            job.interval = self.min_interval
+        else:
+            job.interval = min(self.max_interval, max(self.min_interval, job.interval * self.backoff))
+        job.next_check_at = time.monotonic() + job.interval
+
+    def _publish(self, job: VideoJob) -> None:
+        job.version += 1
+        job.updated_at = time.monotonic()
+        if self.on_update is not None:
+            try:
+                self.on_update(job)
+            except Exception as e:
+                print(f"[WARN] HeyGen poller on_update failed: {e}")
+        changed, job._changed = job._changed, asyncio.Event()
+        changed.set()
+
+    def _gc(self, now: float) -> None:
+        with self._lock:
+            stale = [
+                vid for vid, j in self._jobs.items()
+                if (j.done and now - j.updated_at > self.retention) or now - j.created_at > self.max_age
+            ]
+            for vid in stale:
+                del self._jobs[vid]
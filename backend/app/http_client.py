@@ -0,0 +1,69 @@
+import os
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+# connections kept alive per upstream host (api.heygen.com, api.liveavatar.com, ...)
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    _HTTP2 = True
+except ImportError:
+    _HTTP2 = False
+
+
+def http_timeout(read: float) -> Tuple[float, float]:
+    """(connect, read) timeout tuple for the shared requests session."""
+    return HTTP_CONNECT_TIMEOUT, read
+
+
+def async_timeout(read: float) -> httpx.Timeout:
+    """Per-request timeout for the shared AsyncClients that keeps HTTP_CONNECT_TIMEOUT."""
+    return httpx.Timeout(read, connect=HTTP_CONNECT_TIMEOUT)
+
+
+def _build_session() -> requests.Session:
+    session = requests.Session()
+    # HTTPAdapter pools are per host: each upstream gets up to HTTP_POOL_MAXSIZE kept-alive connections
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=HTTP_POOL_MAXSIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# shared by every sync call (threadpool handlers, catalog loaders)
+HTTP = _build_session()
+
+_async_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def get_async_client(url: str) -> httpx.AsyncClient:
+    """Shared keep-alive AsyncClient for the host of `url` (one pool per upstream host)."""
+    parts = urlsplit(url)
+    origin = f"{parts.scheme}://{parts.netloc}"
+    client: Optional[httpx.AsyncClient] = _async_clients.get(origin)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            http2=_HTTP2,
+            limits=httpx.Limits(
+                max_connections=HTTP_POOL_MAXSIZE,
+                max_keepalive_connections=HTTP_POOL_MAXSIZE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(30.0, connect=HTTP_CONNECT_TIMEOUT),
+        )
+        _async_clients[origin] = client
+    return client
+
+
+async def close_http_clients() -> None:
+    for client in list(_async_clients.values()):
+        await client.aclose()
+    _async_clients.clear()
+    HTTP.close()
@@ -1,6 +1,11 @@
 import asyncio
 import contextlib
+import os
+import socket
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
+from typing import Optional
 
 from livekit import rtc
 from livekit.agents import AgentSession
@@ -11,6 +16,31 @@ from livekit.plugins import liveavatar
 class AgentHandle:
     task: asyncio.Task
     room: rtc.Room
+    # resolved once the agent is in the room and publishing the avatar
+    connected: asyncio.Future
+
+
+def _watch_disconnect(room: rtc.Room) -> asyncio.Event:
+    """Event set by the room's own "disconnected" callback (register before connecting)."""
+    disconnected = asyncio.Event()
+
+    @room.on("disconnected")
+    def _on_disconnected(*args, **kwargs):
+        disconnected.set()
+
+    return disconnected
+
+
+async def _until_disconnected(room: rtc.Room, disconnected: asyncio.Event, max_duration: Optional[float],
+                              session_id: str) -> None:
+    """Sleep without polling until the room disconnects or `max_duration` seconds pass."""
+    if str(room.connection_state).lower() == "disconnected":
+        return
+    try:
+        await asyncio.wait_for(disconnected.wait(), max_duration)
+    except asyncio.TimeoutError:
+        print(f"[WARN] LiveAvatar agent {session_id} reached its max session duration "
+              f"({max_duration:.0f}s), disconnecting.")
 
 
 async def run_liveavatar_agent(
@@ -19,6 +49,7 @@ async def run_liveavatar_agent(
     livekit_agent_token: str,
     avatar_id: str,
     session_id: str,
+    max_session_duration: Optional[float] = None,
 ) -> None:
     """Join the LiveKit room as the agent participant and start the HeyGen LiveAvatar.
 
@@ -30,15 +61,11 @@ async def run_liveavatar_agent(
     This function:
     - connects a LiveKit RTC Room using the agent token
     - starts the liveavatar.AvatarSession
-    - blocks until disconnected.
+    - blocks until disconnected, or until `max_session_duration` seconds have passed.
     """
 
     room = rtc.Room()
-
-    @room.on("disconnected")
-    def _on_disconnected(*args, **kwargs):
-        # let the main await below finish
-        pass
+    disconnected = _watch_disconnect(room)
 
     await room.connect(livekit_url, livekit_agent_token)
 
@@ -54,10 +81,9 @@ async def run_liveavatar_agent(
     # Attach and start publishing tracks
     await avatar.start(agent_session, room=room)
 
-    # Keep running until disconnected / cancelled
+    # Keep running until disconnected / cancelled / out of time
     try:
-        while str(room.connection_state).lower() != "disconnected":
-            await asyncio.sleep(0.5)
+        await _until_disconnected(room, disconnected, max_session_duration, session_id)
     finally:
         try:
             await room.disconnect()
@@ -65,36 +91,163 @@ async def run_liveavatar_agent(
             pass
 
 
+# registry namespaces: agents running in any worker process, and stops requested for them
+AGENT = "agent"
+AGENT_STOP = "agent_stop"
+
+
+def _owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
 class AgentManager:
-    """Small in-process manager for one agent per LiveAvatar session_id."""
+    """Small in-process manager for one agent per LiveAvatar session_id.
+
+    With a shared registry (see `use_registry`), every running agent is
+    recorded with its owning process and refreshed by a heartbeat, so any
+    worker can report it as running; a stop that reaches a worker which does
+    not own the agent is recorded as a request (its own AGENT_STOP key, which
+    heartbeats never overwrite) that the owner picks up on its next heartbeat. Records of crashed workers expire after `ttl` seconds.
+    Registry I/O (SQLite/Redis) never runs on the loop: writes go through one
+    background thread, which keeps them in order, and reads through a thread.
+    """
 
     def __init__(self):
         self._by_session_id: dict[str, AgentHandle] = {}
+        self.registry = None
+        self.heartbeat = 5.0
+        self.ttl = 30.0
+        self._writer: Optional[ThreadPoolExecutor] = None
 
-    async def start(self, *, livekit_url: str, livekit_agent_token: str, avatar_id: str, session_id: str) -> None:
-        if session_id in self._by_session_id:
-            return
+    def use_registry(self, store, heartbeat: float = 5.0, ttl: float = 30.0) -> None:
+        self.registry = store
+        self.heartbeat = heartbeat
+        self.ttl = max(ttl, heartbeat * 2)
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="agent-registry")
+
+    def _write(self, method: str, *args) -> Future:
+        def _run():
+            try:
+                getattr(self.registry, method)(*args)
+            except Exception as e:
+                print(f"[WARN] Agent registry {method} failed: {e}")
+
+        return self._writer.submit(_run)
+
+    def _publish(self, session_id: str) -> Optional[Future]:
+        if self.registry is None:
+            return None
+        return self._write("set", AGENT, session_id, {"owner": _owner(), "at": time.time()}, time.time() + self.ttl)
+
+    async def run_registry(self) -> None:
+        """Heartbeat for the agents this process owns; also executes stops requested elsewhere."""
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            for session_id in list(self._by_session_id):
+                if await asyncio.to_thread(self.registry.get, AGENT_STOP, session_id) is not None:
+                    await self.stop(session_id)
+                elif session_id in self._by_session_id:
+                    self._publish(session_id)
+
+    async def start(
+            self,
+            *,
+            livekit_url: str,
+            livekit_agent_token: str,
+            avatar_id: str,
+            session_id: str,
+            timeout: float = 20.0,
+            max_session_duration: Optional[float] = None,
+    ) -> None:
+        """Start the agent and return once it has joined the room.
 
+        Must be awaited on the server's event loop. A second start for the same
+        session waits for the first one. Raises asyncio.TimeoutError if it is not
+        connected within `timeout` (the launching call then stops the agent
+        again), or the connection error if joining failed.
+        """
+        h = self._by_session_id.get(session_id)
+        if h is None and self.registry is not None:
+            if await asyncio.to_thread(self.is_running, session_id):
+                return  # running in another worker process
+            h = self._by_session_id.get(session_id)
+        launched = h is None
+        if launched:
+            h = self._launch(livekit_url, livekit_agent_token, avatar_id, session_id, max_session_duration)
+
+        try:
+            await asyncio.wait_for(asyncio.shield(h.connected), timeout)
+        except BaseException:
+            # only the request that launched the agent may tear it down; a duplicate
+            # start that times out or is cancelled leaves it to the first one
+            if launched:
+                await self.stop(session_id)
+            raise
+
+    def _launch(self, livekit_url: str, livekit_agent_token: str, avatar_id: str, session_id: str,
+                max_session_duration: Optional[float]) -> AgentHandle:
         room = rtc.Room()
+        disconnected = _watch_disconnect(room)
+        connected = asyncio.get_running_loop().create_future()
 
         async def _runner():
-            await room.connect(livekit_url, livekit_agent_token)
-            agent_session = AgentSession()
-            avatar = liveavatar.AvatarSession(
-                avatar_id=avatar_id,
-                participant_identity=f"liveavatar-agent-{session_id}",
-            )
-            await avatar.start(agent_session, room=room)
-            while str(room.connection_state).lower() != "disconnected":
-                await asyncio.sleep(0.5)
-
-        task = asyncio.create_task(_runner())
-        self._by_session_id[session_id] = AgentHandle(task=task, room=room)
+            try:
+                await room.connect(livekit_url, livekit_agent_token)
+                agent_session = AgentSession()
+                avatar = liveavatar.AvatarSession(
+                    avatar_id=avatar_id,
+                    participant_identity=f"liveavatar-agent-{session_id}",
+                )
+                await avatar.start(agent_session, room=room)
+                connected.set_result(None)
+                await _until_disconnected(room, disconnected, max_session_duration, session_id)
+            except asyncio.CancelledError:
+                if not connected.done():
+                    connected.set_exception(RuntimeError("Agent was stopped before it connected."))
+                raise
+            except Exception as e:
+                if not connected.done():
+                    connected.set_exception(e)
+                raise
+            finally:
+                with contextlib.suppress(Exception):
+                    await room.disconnect()
+
+        h = AgentHandle(task=asyncio.create_task(_runner()), room=room, connected=connected)
+        # however the agent ends (disconnect, crash, stop), its handle is released right away
+        h.task.add_done_callback(lambda _: self._forget(session_id, h))
+        self._by_session_id[session_id] = h
+        if self.registry is not None:
+            # a leftover request for an earlier agent of this session must not stop the new one
+            self._write("delete", AGENT_STOP, session_id)
+        self._publish(session_id)
+        return h
+
+    def _forget(self, session_id: str, h: AgentHandle) -> None:
+        if self._by_session_id.get(session_id) is h:
+            del self._by_session_id[session_id]
+            if self.registry is not None:
+                self._write("delete", AGENT, session_id)
+                self._write("delete", AGENT_STOP, session_id)
+        # nobody awaited a failed start: keep asyncio from logging it as unretrieved
+        if h.connected.done() and not h.connected.cancelled():
+            h.connected.exception()
+        if not h.task.cancelled():
+            h.task.exception()
 
     async def stop(self, session_id: str) -> None:
         h = self._by_session_id.pop(session_id, None)
         if not h:
+            if self.registry is None:
+                return
+            if await asyncio.to_thread(self.registry.get, AGENT, session_id) is not None:
+                await asyncio.wrap_future(self._write(
+                    "set", AGENT_STOP, session_id, {"by": _owner(), "at": time.time()}, time.time() + self.ttl
+                ))
             return
+        if self.registry is not None:
+            self._write("delete", AGENT, session_id)
+            self._write("delete", AGENT_STOP, session_id)
         try:
             await h.room.disconnect()
         except Exception:
@@ -104,9 +257,21 @@ class AgentManager:
             with contextlib.suppress(asyncio.CancelledError, Exception):
                 await h.task
 
+    async def stop_all(self) -> None:
+        await asyncio.gather(*[self.stop(session_id) for session_id in list(self._by_session_id)])
+
+    def sessions(self) -> list[str]:
+        """Sessions whose agent this process is running (or still connecting)."""
+        return [session_id for session_id, h in self._by_session_id.items() if not h.task.done()]
+
     def is_running(self, session_id: str) -> bool:
         h = self._by_session_id.get(session_id)
-        return bool(h and not h.task.done())
+        if h is not None:
+            return not h.task.done()
+        if self.registry is None:
+            return False
+        return (self.registry.get(AGENT, session_id) is not None
+                and self.registry.get(AGENT_STOP, session_id) is None)
 
 
 # singleton
@@ -0,0 +1,98 @@
+import asyncio
+import os
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+from app.worker_budget import process_count
+
+
+class LLMScheduler:
+    """Bounds how many Ollama generations run at once.
+
+    Waiting requests are queued per caller key (usually the username) and free
+    slots are handed out round-robin across keys, so a user firing several
+    quizzes at once cannot starve everybody else.
+    """
+
+    def __init__(self, max_in_flight: int):
+        self.max_in_flight = max(1, max_in_flight)
+        self._in_flight = 0
+        self._queues: "OrderedDict[str, deque[asyncio.Future]]" = OrderedDict()
+
+    @asynccontextmanager
+    async def slot(self, key: str = ""):
+        await self._acquire(key)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def stats(self) -> dict:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self._in_flight,
+            "queued": sum(len(q) for q in self._queues.values()),
+            "waiting_callers": len(self._queues),
+        }
+
+    async def _acquire(self, key: str) -> None:
+        if self._in_flight < self.max_in_flight and not self._queues:
+            self._in_flight += 1
+            return
+
+        fut = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(key, deque()).append(fut)
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # slot was granted just before the waiter got cancelled: pass it on
+                self._release()
+            else:
+                self._discard(key, fut)
+            raise
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        self._wake_next()
+
+    def _discard(self, key: str, fut: asyncio.Future) -> None:
+        q = self._queues.get(key)
+        if q is None:
+            return
+        try:
+            q.remove(fut)
+        except ValueError:
+            pass
+        if not q:
+            del self._queues[key]
+
+    def _wake_next(self) -> None:
+        while self._in_flight < self.max_in_flight and self._queues:
+            key, q = next(iter(self._queues.items()))
+            fut = q.popleft()
+            if q:
+                # round-robin: this caller goes to the back of the line
+                self._queues.move_to_end(key)
+            else:
+                del self._queues[key]
+            if fut.done():
+                continue
+            self._in_flight += 1
+            fut.set_result(None)
+
+
+def _max_in_flight_from_env() -> int:
+    """LLM_MAX_IN_FLIGHT is per process; OLLAMA_NUM_PARALLEL is the server's total,
+    so it is split between the worker processes."""
+    try:
+        if os.getenv("LLM_MAX_IN_FLIGHT"):
+            return int(os.getenv("LLM_MAX_IN_FLIGHT"))
+        total = int(os.getenv("OLLAMA_NUM_PARALLEL") or "2")
+    except ValueError:
+        return 2
+    return max(1, -(-total // process_count()))
+
+
+# singleton
+LLM_SCHEDULER = LLMScheduler(_max_in_flight_from_env())
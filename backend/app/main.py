@@ -1,17 +1,19 @@
+import asyncio
+import contextlib
+import hashlib
 import json
 import os
 import smtplib
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-import tempfile
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
-from functools import lru_cache
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import re
+import httpx
 import jwt
-import requests
-import torch
-import whisper
+import numpy as np
 from dotenv import load_dotenv
 from fastapi import (
     FastAPI,
@@ -20,13 +22,32 @@ from fastapi import (
     Form,
     HTTPException,
     UploadFile,
+    WebSocket,
+    WebSocketDisconnect,
 )
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel
-
-from app.ollama_client import OllamaTeacher
+from pydantic import BaseModel, Field, ValidationError
+
+from app.answer_cache import AnswerCache
+from app.catalog_cache import RefreshingCache
+from app.heygen_poller import HeyGenStatusPoller, VideoJob
+from app.http_client import HTTP, HTTP_CONNECT_TIMEOUT, async_timeout, close_http_clients, get_async_client, http_timeout
+from app.llm_scheduler import LLM_SCHEDULER
+from app.question_pipeline import RENDERING, THINKING, TRANSCRIBING, PipelineBusy, QuestionJob, QuestionPipeline
+from app.quiz_bank import SUBJECTS, QuizBank, bank_key_for
+from app.quiz_stream import QuizStreamParser
+from app.render_cache import RenderCache
+from app.reply_chunker import SentenceChunker
+from app.session_store import create_session_store
+from app.stt import STT_ENGINE, STT_MODEL_SIZE, NoSpeech, TranscriptionBusy, TranscriptionPool
+from app.vad import SpeechSegmenter
+from app.ollama_client import SYSTEM_PROMPT, AsyncOllamaTeacher
+from app.agent_queue import AgentDispatcher, AgentQueue
 from app.liveavatar_agent import AGENT_MANAGER
+from app.worker_budget import cpu_share, process_count, stt_workers_for_budget
 
 load_dotenv()
 
@@ -77,7 +98,29 @@ QUIZ_PROMPT = '''
 > ```
 >
 >
-> **Task:** Generate a quiz based on the following description:'''
+> **Task:** Generate a quiz based on the description in the user message.'''
+
+# The quiz prompts are sent as system messages, so they form a stable prefix Ollama can keep
+# cached; only the description (and topic) travels in the user message.
+
+# One question at a time: replaces a question that came out invalid, and builds parallel quizzes.
+QUIZ_QUESTION_PROMPT = '''
+> You are an API endpoint that generates ONE quiz question in strict JSON format.
+> Return only a JSON object with "questionText", exactly four "answers" and "correctAnswerIndex" (0-3).
+> Double-check that the answer at `correctAnswerIndex` is objectively correct.
+> The user message gives the quiz description, the topic the question must be about,
+> and the other questions of the quiz, which it must be different from.
+>
+> **Task:** Generate the question.'''
+
+# Parallel mode plans the quiz first, then generates every question concurrently.
+QUIZ_OUTLINE_PROMPT = '''
+> You are an API endpoint that plans educational quizzes in strict JSON format.
+> Return only a JSON object with a creative "quizName", the "subject" (e.g., Math, Geography, History)
+> and "topics": one short, distinct topic per question, in the order they should be asked.
+> Use as many topics as the description asks questions for (10 if it does not say).
+>
+> **Task:** Plan a quiz based on the description in the user message.'''
 
 if not HEYGEN_API_KEY:
     raise RuntimeError("Missing HEYGEN_API_KEY in .env")
@@ -131,12 +174,25 @@ class QuestionResponse(BaseModel):
     job_id: str
 
 
+class ClipStatus(BaseModel):
+    index: int
+    text: str
+    status: str
+    video_url: Optional[str] = None
+    error_message: Optional[str] = None
+
+
 class QuestionStatusResponse(BaseModel):
+    # queued/transcribing/thinking/rendering while in the pipeline, then completed/failed
     status: str
     video_url: Optional[str] = None
     error: Optional[Any] = None
     error_message: Optional[str] = None
     raw_status: Optional[dict] = None
+    transcript: Optional[str] = None
+    reply: Optional[str] = None
+    # chunked mode: ordered playlist; play clip N while N+1.. are still rendering
+    clips: Optional[List[ClipStatus]] = None
 
 
 class AvatarSelection(BaseModel):
@@ -165,9 +221,9 @@ class ContactEmailRequest(BaseModel):
 
 
 class Question(BaseModel):
-    questionText: str
-    answers: List[str]
-    correctAnswerIndex: int
+    questionText: str = Field(min_length=1)
+    answers: List[str] = Field(min_length=4, max_length=4)
+    correctAnswerIndex: int = Field(ge=0, le=3)
 
 
 # Definește structura pentru întregul Quiz
@@ -197,15 +253,27 @@ def create_access_token(username: str) -> str:
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALG)
 
 
-def get_current_user(token: HTTPAuthorizationCredentials = Depends(security)) -> str:
+def token_claims(token: HTTPAuthorizationCredentials = Depends(security)) -> Dict[str, Any]:
+    # FastAPI caches dependencies per request, so the JWT is decoded once
+    return claims_from_token(token.credentials)
+
+
+def get_current_user(claims: Dict[str, Any] = Depends(token_claims)) -> str:
+    return claims["sub"]
+
+
+def claims_from_token(raw_token: str) -> Dict[str, Any]:
     try:
-        payload = jwt.decode(token.credentials, JWT_SECRET, algorithms=[JWT_ALG])
-        username = payload.get("sub")
-        if not username:
-            raise HTTPException(status_code=401, detail="Invalid token.")
-        return username
+        payload = jwt.decode(raw_token, JWT_SECRET, algorithms=[JWT_ALG])
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid or expired token.")
+    if not payload.get("sub"):
+        raise HTTPException(status_code=401, detail="Invalid token.")
+    return payload
+
+
+def username_from_token(raw_token: str) -> str:
+    return claims_from_token(raw_token)["sub"]
 
 
 @app.post("/auth/login", response_model=LoginResponse)
@@ -216,27 +284,189 @@ def login(data: LoginRequest):
     return LoginResponse(access_token=token)
 
 
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 print("=== START BACKEND ===")
-print("=== LOAD WHISPER ===")
-whisper_model = whisper.load_model("base")
-print("Whisper loaded.")
-model = OllamaTeacher()
+# The STT models are loaded off the import path by the worker threads: at startup (STT_PRELOAD=1)
+# or on the first voice question, so text-only routes are served immediately.
+# Memory (MB) this worker process may spend on STT models; sizes the pool when STT_WORKERS is unset.
+WORKER_MEMORY_MB = int(os.getenv("WORKER_MEMORY_MB", "0"))
+
+
+def _stt_worker_count() -> Optional[int]:
+    explicit = int(os.getenv("STT_WORKERS", "0"))
+    if explicit or not WORKER_MEMORY_MB:
+        return explicit or None
+    return stt_workers_for_budget(WORKER_MEMORY_MB, STT_ENGINE, STT_MODEL_SIZE, cap=max(1, cpu_share() // 2))
+
+
+stt_pool = TranscriptionPool(
+    workers=_stt_worker_count(),
+    queue_size=int(os.getenv("STT_QUEUE_SIZE", "16")),
+    batch_window=float(os.getenv("STT_BATCH_WINDOW_MS", "20")) / 1000,
+    max_batch=int(os.getenv("STT_MAX_BATCH", "8")),
+)
+STT_PRELOAD = os.getenv("STT_PRELOAD", "1") == "1"
+STT_TIMEOUT_SECONDS = float(os.getenv("STT_TIMEOUT_SECONDS", "120"))
+
+
+@app.on_event("startup")
+def _preload_whisper() -> None:
+    if STT_PRELOAD:
+        stt_pool.start()
+
+
+@app.get("/health")
+def health() -> Dict[str, Any]:
+    """Liveness plus per-component readiness; the API itself is ready as soon as it answers."""
+    return {
+        "status": "ok",
+        "worker": {"pid": os.getpid(), "processes": process_count(), "memory_budget_mb": WORKER_MEMORY_MB or None},
+        "stt": stt_pool.status(),
+    }
+
+
+@app.get("/health/stt")
+def health_stt() -> Dict[str, Any]:
+    """503 until the speech-to-text model is loaded (for probes that gate voice traffic)."""
+    if not stt_pool.ready:
+        raise HTTPException(status_code=503, detail=stt_pool.status())
+    return stt_pool.status()
 
 
-def generate_reply_ollama(student_question: str) -> str:
-    return model.ask(student_question)
+model = AsyncOllamaTeacher(LLM_SCHEDULER)
 
+# Optional semantic tier: set to an Ollama embedding model (e.g. nomic-embed-text)
+ANSWER_CACHE_EMBED_MODEL = os.getenv("ANSWER_CACHE_EMBED_MODEL", "").strip()
 
-def transcribe_audio_file(filepath: str) -> str:
+
+async def _embed_question(text: str) -> List[float]:
+    resp = await model.client.embed(model=ANSWER_CACHE_EMBED_MODEL, input=text)
+    return resp["embeddings"][0]
+
+
+answer_cache = AnswerCache(
+    max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1024")),
+    ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(24 * 3600))),
+    embed_fn=_embed_question if ANSWER_CACHE_EMBED_MODEL else None,
+    similarity=float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95")),
+)
+
+
+async def generate_reply_ollama(student_question: str, user: str = "", use_cache: bool = True) -> str:
+    if use_cache:
+        cached = await answer_cache.lookup(student_question)
+        if cached is not None:
+            return cached
     try:
-        result = whisper_model.transcribe(filepath, language="ro")
+        reply = await model.ask(student_question, key=user)
     except Exception as e:
-        raise RuntimeError(f"Whisper error: {e}")
-    text = (result.get("text") or "").strip()
-    if not text:
-        raise RuntimeError("No speech recognized from audio.")
-    return text
+        raise HTTPException(status_code=502, detail=f"LLM error ({type(e).__name__}): {e}")
+    if use_cache:
+        await answer_cache.store(student_question, reply)
+    return reply
+
+
+async def reply_events(student_question: str, user: str = ""):
+    """{"token": ...} per chunk, then {"done": true, "timings": {...}} (or a single {"error": ...})."""
+    cached = await answer_cache.lookup(student_question)
+    if cached is not None:
+        yield {"token": cached, "cached": True}
+        yield {"done": True}
+        return
+
+    parts: List[str] = []
+    timings: Dict[str, Any] = {}
+    try:
+        async for token in model.stream(student_question, key=user, timings=timings):
+            parts.append(token)
+            yield {"token": token}
+    except Exception as e:
+        yield {"error": f"LLM error ({type(e).__name__}): {e}"}
+        return
+    await answer_cache.store(student_question, "".join(parts))
+    yield {"done": True, "timings": timings}
+
+
+async def stream_reply_ollama(student_question: str, user: str = ""):
+    """NDJSON lines for /chat/stream."""
+    async for event in reply_events(student_question, user):
+        yield json.dumps(event, ensure_ascii=False) + "\n"
+
+
+@app.get("/api/cache/answers")
+def answer_cache_stats(user: str = Depends(get_current_user)) -> Dict[str, Any]:
+    return answer_cache.stats()
+
+
+OLLAMA_WARMUP = os.getenv("OLLAMA_WARMUP", "1") == "1"
+_ollama_warmup: Optional[asyncio.Task] = None
+
+
+async def _warm_up_ollama() -> None:
+    try:
+        await model.warm_up({
+            "chat": SYSTEM_PROMPT,
+            "quiz": QUIZ_PROMPT,
+            "quiz_outline": QUIZ_OUTLINE_PROMPT,
+            "quiz_question": QUIZ_QUESTION_PROMPT,
+        })
+    except Exception as e:
+        print(f"[WARN] Ollama warm-up failed: {e}")
+
+
+@app.on_event("startup")
+async def _start_ollama_warmup() -> None:
+    global _ollama_warmup
+    if OLLAMA_WARMUP:
+        _ollama_warmup = asyncio.create_task(_warm_up_ollama())
+
+
+@app.on_event("shutdown")
+async def _stop_ollama_warmup() -> None:
+    if _ollama_warmup is not None:
+        _ollama_warmup.cancel()
+
+
+@app.get("/api/llm/stats")
+def llm_stats(user: str = Depends(get_current_user)) -> Dict[str, Any]:
+    """Scheduler load plus Ollama's prompt-eval vs. eval timings per prompt kind."""
+    return {"scheduler": LLM_SCHEDULER.stats(), **model.timings.stats()}
+
+
+async def transcribe_audio(audio: bytes) -> str:
+    """Transcribe uploaded audio bytes; decoding happens in memory on the STT worker."""
+    try:
+        return await stt_pool.transcribe(audio, timeout=STT_TIMEOUT_SECONDS)
+    except TranscriptionBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Transcription timed out.")
+
+
+# HeyGen signed video URLs stay valid for days; a day of reuse is a safe default.
+render_cache = RenderCache(
+    ttl_seconds=float(os.getenv("HEYGEN_RENDER_CACHE_TTL_SECONDS", str(24 * 3600))),
+    max_entries=int(os.getenv("HEYGEN_RENDER_CACHE_MAX_ENTRIES", "2048")),
+)
+
+
+def _heygen_submit_render(payload: dict) -> str:
+    data = _heygen_post_generate(payload)
+    video_id = (data.get("data") or {}).get("video_id") or data.get("video_id")
+    if not video_id:
+        raise HTTPException(status_code=502, detail=f"Missing video_id in HeyGen response: {data}")
+    return video_id
+
+
+def _heygen_generate_video_id(payload: dict) -> str:
+    """Submit a render, or reuse the one already made (or in progress) for the same payload."""
+    video_id = render_cache.get_or_submit(payload, _heygen_submit_render)
+    status_poller.track(video_id)
+    return video_id
+
+
+@app.get("/api/cache/renders")
+def render_cache_stats(user: str = Depends(get_current_user)) -> Dict[str, Any]:
+    return render_cache.stats()
 
 
 def create_heygen_video_from_avatar_id(text: str, avatar_id: str, voice_id: str) -> str:
@@ -260,11 +490,7 @@ def create_heygen_video_from_avatar_id(text: str, avatar_id: str, voice_id: str)
         "dimension": {"width": 1280, "height": 720},
     }
 
-    data = _heygen_post_generate(payload)
-    video_id = (data.get("data") or {}).get("video_id") or data.get("video_id")
-    if not video_id:
-        raise HTTPException(status_code=502, detail=f"Missing video_id in HeyGen response: {data}")
-    return video_id
+    return _heygen_generate_video_id(payload)
 
 
 def create_heygen_video_from_photo_url(text: str, photo_url: str, voice_id: str) -> str:
@@ -287,11 +513,7 @@ def create_heygen_video_from_photo_url(text: str, photo_url: str, voice_id: str)
         "dimension": {"width": 1280, "height": 720},
     }
 
-    data = _heygen_post_generate(payload)
-    video_id = (data.get("data") or {}).get("video_id") or data.get("video_id")
-    if not video_id:
-        raise HTTPException(status_code=502, detail=f"Missing video_id in HeyGen response: {data}")
-    return video_id
+    return _heygen_generate_video_id(payload)
 
 
 def create_heygen_video_from_talking_photo_id(text: str, talking_photo_id: str, voice_id: str) -> str:
@@ -320,25 +542,57 @@ def create_heygen_video_from_talking_photo_id(text: str, talking_photo_id: str,
         "dimension": {"width": 1280, "height": 720},
     }
 
-    data = _heygen_post_generate(payload)
-    video_id = (data.get("data") or {}).get("video_id") or data.get("video_id")
-    if not video_id:
-        raise HTTPException(status_code=502, detail=f"Missing video_id in HeyGen response: {data}")
-    return video_id
+    return _heygen_generate_video_id(payload)
 
 
-def get_heygen_status(video_id: str) -> dict:
+async def get_heygen_status(video_id: str) -> dict:
     headers = {"X-Api-Key": HEYGEN_API_KEY, "Accept": "application/json"}
-    resp = requests.get(HEYGEN_STATUS_URL, headers=headers, params={"video_id": video_id}, timeout=30)
+    client = get_async_client(HEYGEN_STATUS_URL)
+    resp = await client.get(
+        HEYGEN_STATUS_URL, headers=headers, params={"video_id": video_id}, timeout=async_timeout(30)
+    )
     resp.raise_for_status()
     return resp.json().get("data", {})
 
 
-def fetch_one_avatar_from_group(group_id: str) -> Optional[Avatar]:
+def _on_video_job_update(job: VideoJob) -> None:
+    if job.status == "completed" and job.video_url:
+        render_cache.mark_completed(job.video_id, job.video_url)
+    elif job.status == "failed":
+        render_cache.mark_failed(job.video_id)
+
+
+status_poller = HeyGenStatusPoller(
+    get_heygen_status,
+    min_interval=float(os.getenv("HEYGEN_POLL_MIN_INTERVAL", "3")),
+    max_interval=float(os.getenv("HEYGEN_POLL_MAX_INTERVAL", "30")),
+    max_concurrency=int(os.getenv("HEYGEN_POLL_CONCURRENCY", "8")),
+    max_failures=int(os.getenv("HEYGEN_POLL_MAX_FAILURES", "5")),
+    on_update=_on_video_job_update,
+)
+
+
+@app.on_event("startup")
+async def _start_status_poller() -> None:
+    status_poller.start()
+
+
+@app.on_event("shutdown")
+async def _stop_status_poller() -> None:
+    await status_poller.stop()
+    await close_http_clients()
+
+
+# Catalog fan-out: groups are fetched in parallel, each with its own timeout budget
+AVATAR_FETCH_CONCURRENCY = int(os.getenv("AVATAR_FETCH_CONCURRENCY", "16"))
+AVATAR_GROUP_TIMEOUT = float(os.getenv("AVATAR_GROUP_TIMEOUT", "8"))
+
+
+def fetch_one_avatar_from_group(group_id: str, timeout: float = 30) -> Optional[Avatar]:
     url = f"{HEYGEN_BASE_URL}/v2/avatar_group/{group_id}/avatars"
     headers = {"X-Api-Key": HEYGEN_API_KEY, "Accept": "application/json"}
     try:
-        resp = requests.get(url, headers=headers, timeout=30)
+        resp = HTTP.get(url, headers=headers, timeout=http_timeout(timeout))
         resp.raise_for_status()
         raw = resp.json()
     except Exception as e:
@@ -362,20 +616,39 @@ def fetch_one_avatar_from_group(group_id: str) -> Optional[Avatar]:
 
 
 def fetch_avatars_from_heygen() -> List[Avatar]:
+    """Fetch one avatar per group concurrently, keeping AVATAR_GROUP_IDS order.
+
+    Groups that fail or exceed their budget are skipped, so a slow group costs
+    at most AVATAR_GROUP_TIMEOUT instead of delaying the whole catalog.
+    """
+    workers = max(1, min(AVATAR_FETCH_CONCURRENCY, len(AVATAR_GROUP_IDS)))
+    waves = -(-len(AVATAR_GROUP_IDS) // workers)
+    # hard deadline: read timeouts only bound the gap between bytes, not the whole response
+    budget = waves * (AVATAR_GROUP_TIMEOUT + HTTP_CONNECT_TIMEOUT)
+
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="avatar-fetch")
+    try:
+        futures = [pool.submit(fetch_one_avatar_from_group, gid, AVATAR_GROUP_TIMEOUT) for gid in AVATAR_GROUP_IDS]
+        wait(futures, timeout=budget)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
     avatars: List[Avatar] = []
-    for group_id in AVATAR_GROUP_IDS:
-        a = fetch_one_avatar_from_group(group_id)
+    for group_id, fut in zip(AVATAR_GROUP_IDS, futures):
+        if not fut.done() or fut.cancelled():
+            print(f"[WARN] Avatar group {group_id} timed out, skipping.")
+            continue
+        if fut.exception() is not None:
+            print(f"[WARN] Failed avatars for group_id={group_id}: {fut.exception()}")
+            continue
+        a = fut.result()
         if a:
             avatars.append(a)
     return avatars
 
 
-@lru_cache(maxsize=1)
 def get_cached_avatars() -> List[Avatar]:
-    try:
-        return fetch_avatars_from_heygen()
-    except Exception:
-        return []
+    return avatar_catalog.get()
 
 
 @app.get("/avatars", response_model=List[Avatar])
@@ -386,11 +659,10 @@ def list_avatars(user: str = Depends(get_current_user)):
     return avatars
 
 
-@lru_cache(maxsize=1)
-def get_cached_voices() -> List[Voice]:
+def fetch_voices_from_heygen() -> List[Voice]:
     headers = {"X-Api-Key": HEYGEN_API_KEY, "Accept": "application/json"}
     try:
-        resp = requests.get(HEYGEN_VOICES_URL, headers=headers, timeout=30)
+        resp = HTTP.get(HEYGEN_VOICES_URL, headers=headers, timeout=http_timeout(30))
         resp.raise_for_status()
         raw = resp.json()
         items = raw.get("data", {}).get("voices", []) or []
@@ -417,6 +689,26 @@ def get_cached_voices() -> List[Voice]:
     return voices[:20] if len(voices) > 20 else voices
 
 
+def get_cached_voices() -> List[Voice]:
+    return voice_catalog.get()
+
+
+CATALOG_TTL_SECONDS = float(os.getenv("CATALOG_TTL_SECONDS", "3600"))
+avatar_catalog: RefreshingCache[Avatar] = RefreshingCache("avatars", fetch_avatars_from_heygen, CATALOG_TTL_SECONDS)
+voice_catalog: RefreshingCache[Voice] = RefreshingCache("voices", fetch_voices_from_heygen, CATALOG_TTL_SECONDS)
+
+
+@app.on_event("startup")
+def _warm_catalogs() -> None:
+    avatar_catalog.refresh_in_background()
+    voice_catalog.refresh_in_background()
+
+
+@app.get("/api/catalog/status")
+def catalog_status(user: str = Depends(get_current_user)) -> Dict[str, Any]:
+    return {"avatars": avatar_catalog.status(), "voices": voice_catalog.status()}
+
+
 @app.get("/voices", response_model=List[Voice])
 def list_voices(user: str = Depends(get_current_user)):
     voices = get_cached_voices()
@@ -426,23 +718,21 @@ def list_voices(user: str = Depends(get_current_user)):
 
 
 @app.get("/api/heygen/avatar-group/{group_id}/avatars")
-def heygen_avatar_group_avatars(group_id: str, user: str = Depends(get_current_user)) -> Dict[str, Any]:
+async def heygen_avatar_group_avatars(group_id: str, user: str = Depends(get_current_user)) -> Dict[str, Any]:
     url = f"{HEYGEN_BASE_URL}/v2/avatar_group/{group_id}/avatars"
     headers = {"X-Api-Key": HEYGEN_API_KEY, "Accept": "application/json"}
     try:
-        resp = requests.get(url, headers=headers, timeout=30)
+        resp = await get_async_client(url).get(url, headers=headers, timeout=async_timeout(30))
         resp.raise_for_status()
         return resp.json()
-    except requests.HTTPError as e:
-        status = e.response.status_code if e.response is not None else 502
-        detail = e.response.text if e.response is not None else str(e)
-        raise HTTPException(status_code=status, detail=detail)
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=e.response.text)
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"HeyGen proxy error: {e}")
 
 
 @app.get("/api/heygen/photo-avatar/{photo_avatar_id}")
-def heygen_photo_avatar(photo_avatar_id: str, user: str = Depends(get_current_user)) -> Dict[str, Any]:
+async def heygen_photo_avatar(photo_avatar_id: str, user: str = Depends(get_current_user)) -> Dict[str, Any]:
     """Proxy for HeyGen photo avatar details.
 
     HeyGen endpoint: GET /v2/photo_avatar/{id}
@@ -451,36 +741,48 @@ def heygen_photo_avatar(photo_avatar_id: str, user: str = Depends(get_current_us
     url = f"{HEYGEN_BASE_URL}/v2/photo_avatar/{photo_avatar_id}"
     headers = {"X-Api-Key": HEYGEN_API_KEY, "Accept": "application/json"}
     try:
-        resp = requests.get(url, headers=headers, timeout=30)
+        resp = await get_async_client(url).get(url, headers=headers, timeout=async_timeout(30))
         resp.raise_for_status()
         return resp.json()
-    except requests.HTTPError as e:
-        status = e.response.status_code if e.response is not None else 502
-        detail = e.response.text if e.response is not None else str(e)
-        raise HTTPException(status_code=status, detail=detail)
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=e.response.text)
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"HeyGen proxy error: {e}")
 
 
-_SELECTION_BY_TOKEN: Dict[str, Dict[str, Any]] = {}
-_PHOTO_AVATAR_BY_TOKEN: Dict[str, Dict[str, Any]] = {}
+# Selections outlive a single request and must be visible to every worker:
+# SESSION_STORE=memory (single process), sqlite[:///path] (all workers on a host) or redis://...
+session_store = create_session_store(os.getenv("SESSION_STORE", "memory"))
+SELECTION = "selection"
+PHOTO_AVATAR = "photo_avatar"
 
 
 def _token_key_from_bearer(creds: HTTPAuthorizationCredentials) -> str:
-    return creds.credentials
+    # the raw bearer token is never stored
+    return hashlib.sha256(creds.credentials.encode("utf-8")).hexdigest()
+
+
+def _session_expiry(claims: Dict[str, Any]) -> float:
+    """Stored state lives exactly as long as the token it belongs to."""
+    return float(claims.get("exp") or time.time() + 8 * 3600)
+
+
+@app.get("/api/session/store")
+def session_store_stats(user: str = Depends(get_current_user)) -> Dict[str, Any]:
+    return session_store.stats()
 
 
 @app.post("/api/session/selection")
 def set_selection(
         payload: SelectionPayload,
         creds: HTTPAuthorizationCredentials = Depends(security),
-        user: str = Depends(get_current_user),
+        claims: Dict[str, Any] = Depends(token_claims),
 ) -> Dict[str, Any]:
     token_key = _token_key_from_bearer(creds)
-    _SELECTION_BY_TOKEN[token_key] = {
+    session_store.set(SELECTION, token_key, {
         "avatar": payload.avatar.model_dump(),
         "voice": payload.voice.model_dump(),
-    }
+    }, _session_expiry(claims))
     return {"ok": True}
 
 
@@ -490,7 +792,7 @@ def get_selection(
         user: str = Depends(get_current_user),
 ) -> Dict[str, Any]:
     token_key = _token_key_from_bearer(creds)
-    sel = _SELECTION_BY_TOKEN.get(token_key)
+    sel = session_store.get(SELECTION, token_key)
     if not sel:
         raise HTTPException(status_code=404, detail="No selection stored.")
     return sel
@@ -518,7 +820,7 @@ class PhotoAvatarGenerateResponse(BaseModel):
 
 
 @app.post("/api/heygen/photo-avatar/generate", response_model=PhotoAvatarGenerateResponse)
-def photo_avatar_generate(
+async def photo_avatar_generate(
         req: PhotoAvatarGenerateRequest,
         user: str = Depends(get_current_user),
 ) -> PhotoAvatarGenerateResponse:
@@ -541,8 +843,8 @@ def photo_avatar_generate(
     if req.appearance:
         payload["appearance"] = req.appearance
 
-    resp = requests.post(url, json=payload, headers=headers, timeout=60)
-    if not resp.ok:
+    resp = await get_async_client(url).post(url, json=payload, headers=headers, timeout=async_timeout(60))
+    if not resp.is_success:
         raise HTTPException(status_code=resp.status_code, detail=resp.text)
 
     raw = resp.json() or {}
@@ -554,15 +856,15 @@ def photo_avatar_generate(
 
 
 @app.get("/api/heygen/photo-avatar/status/{generation_id}", response_model=PhotoAvatarStatusResponse)
-def photo_avatar_status(
+async def photo_avatar_status(
         generation_id: str,
         creds: HTTPAuthorizationCredentials = Depends(security),
         user: str = Depends(get_current_user),
 ) -> PhotoAvatarStatusResponse:
     url = f"{HEYGEN_BASE_URL}/v2/photo_avatar/generation/{generation_id}"
     headers = {"accept": "application/json", "x-api-key": HEYGEN_API_KEY}
-    resp = requests.get(url, headers=headers, timeout=60)
-    if not resp.ok:
+    resp = await get_async_client(url).get(url, headers=headers, timeout=async_timeout(60))
+    if not resp.is_success:
         raise HTTPException(status_code=resp.status_code, detail=resp.text)
     raw = resp.json()
     data = raw.get("data") or {}
@@ -594,7 +896,7 @@ class PhotoAvatarGroupCreateResponse(BaseModel):
 
 
 @app.post("/api/heygen/photo-avatar/avatar-group/create", response_model=PhotoAvatarGroupCreateResponse)
-def photo_avatar_group_create(
+async def photo_avatar_group_create(
         req: PhotoAvatarGroupCreateRequest,
         user: str = Depends(get_current_user),
 ) -> PhotoAvatarGroupCreateResponse:
@@ -610,8 +912,8 @@ def photo_avatar_group_create(
         "name": (req.name or "Gen").strip() or "Gen",
     }
 
-    resp = requests.post(url, json=payload, headers=headers, timeout=60)
-    if not resp.ok:
+    resp = await get_async_client(url).post(url, json=payload, headers=headers, timeout=async_timeout(60))
+    if not resp.is_success:
         raise HTTPException(status_code=resp.status_code, detail=resp.text)
 
     raw = resp.json() or {}
@@ -627,15 +929,15 @@ def photo_avatar_group_create(
 def set_photo_avatar(
         payload: PhotoAvatarPickRequest,
         creds: HTTPAuthorizationCredentials = Depends(security),
-        user: str = Depends(get_current_user),
+        claims: Dict[str, Any] = Depends(token_claims),
 ) -> Dict[str, Any]:
     token_key = _token_key_from_bearer(creds)
-    _PHOTO_AVATAR_BY_TOKEN[token_key] = {
+    session_store.set(PHOTO_AVATAR, token_key, {
         "photo_url": (payload.photo_url or "").strip(),
         "generation_id": payload.generation_id,
         "image_key": (payload.image_key or "").strip(),
         "group_id": (payload.group_id or "").strip(),
-    }
+    }, _session_expiry(claims))
     return {"ok": True}
 
 
@@ -694,6 +996,171 @@ Mesaj:
 
 # --- Existing endpoints (unchanged) ---
 
+def _resolve_render_target(
+        talking_photo_id: str,
+        avatar_id: str,
+        avatar_url: str,
+        token_key: str,
+) -> Tuple[str, str]:
+    # Priority order:
+    # 1) explicit talking_photo_id (photo avatar group id)
+    # 2) explicit avatar_id (stock HeyGen avatar)
+    # 3) legacy avatar_url (talking_photo_url)
+    # 4) session stored group_id (if present)
+    if talking_photo_id:
+        return "talking_photo_id", talking_photo_id
+    if avatar_id:
+        return "avatar_id", avatar_id
+    if avatar_url:
+        return "photo_url", avatar_url
+    # try session
+    photo_sel = session_store.get(PHOTO_AVATAR, token_key) or {}
+    session_group_id = (photo_sel.get("group_id") or "").strip()
+    session_photo_url = (photo_sel.get("photo_url") or "").strip()
+    if session_group_id:
+        return "talking_photo_id", session_group_id
+    if session_photo_url:
+        return "photo_url", session_photo_url
+    raise HTTPException(status_code=400, detail="Missing avatarid or talking_photo_id.")
+
+
+def render_reply_video(text: str, target: Tuple[str, str], voice_id: str) -> str:
+    kind, value = target
+    if kind == "talking_photo_id":
+        return create_heygen_video_from_talking_photo_id(text, value, voice_id)
+    if kind == "avatar_id":
+        return create_heygen_video_from_avatar_id(text, value, voice_id)
+    return create_heygen_video_from_photo_url(text, value, voice_id)
+
+
+async def _stage_transcribe(job: QuestionJob) -> Dict[str, Any]:
+    return {"text": await transcribe_audio(job.audio), "audio": None}
+
+
+# Chunked mode renders the reply as several short clips, submitted while the LLM is still writing.
+QUESTION_CHUNKED_VIDEO = os.getenv("QUESTION_CHUNKED_VIDEO", "0") == "1"
+VIDEO_CHUNK_MIN_CHARS = int(os.getenv("VIDEO_CHUNK_MIN_CHARS", "120"))
+VIDEO_MAX_CLIPS = int(os.getenv("VIDEO_MAX_CLIPS", "6"))
+_clip_render_slots = asyncio.Semaphore(int(os.getenv("VIDEO_CLIP_RENDER_CONCURRENCY", "4")))
+
+
+async def _render_clip(job: QuestionJob, clip: Dict[str, Any]) -> None:
+    try:
+        async with _clip_render_slots:
+            clip["video_id"] = await run_in_threadpool(render_reply_video, clip["text"], job.render_target, job.voice_id)
+    except Exception as e:
+        clip["error"] = str(getattr(e, "detail", None) or e)
+    finally:
+        job.set_status(job.status)
+
+
+def _start_clip(job: QuestionJob, text: str) -> None:
+    clip = {"text": text, "video_id": None, "error": None}
+    job.clips.append(clip)
+    job.clip_tasks.append(asyncio.create_task(_render_clip(job, clip)))
+    job.set_status(job.status)
+
+
+async def _think_chunked(job: QuestionJob) -> Dict[str, Any]:
+    chunker = SentenceChunker(VIDEO_CHUNK_MIN_CHARS, VIDEO_MAX_CLIPS)
+    parts: List[str] = []
+    try:
+        async for event in reply_events(job.text, job.user):
+            if "error" in event:
+                raise HTTPException(status_code=502, detail=event["error"])
+            token = event.get("token")
+            if token:
+                parts.append(token)
+                for chunk in chunker.feed(token):
+                    # the partial reply is only rebuilt when a clip starts, not on every token
+                    job.reply = "".join(parts)
+                    _start_clip(job, chunk)
+        job.reply = "".join(parts)
+        rest = chunker.flush()
+        if rest:
+            _start_clip(job, rest)
+    except BaseException:
+        for task in job.clip_tasks:
+            task.cancel()
+        raise
+    return {"reply": job.reply}
+
+
+async def _stage_think(job: QuestionJob) -> Dict[str, Any]:
+    if job.chunked:
+        return await _think_chunked(job)
+    return {"reply": await generate_reply_ollama(job.text, job.user)}
+
+
+async def _stage_render(job: QuestionJob) -> Dict[str, Any]:
+    if job.chunked:
+        # clips were submitted during the think stage; wait until every one has a video id
+        await asyncio.gather(*job.clip_tasks)
+        errors = [clip["error"] for clip in job.clips if clip["error"]]
+        if errors or not job.clips:
+            raise RuntimeError(errors[0] if errors else "Empty reply from LLM.")
+        return {"video_id": job.clips[0]["video_id"]}
+    video_id = await run_in_threadpool(render_reply_video, job.reply, job.render_target, job.voice_id)
+    return {"video_id": video_id}
+
+
+question_pipeline = QuestionPipeline(
+    transcribe=_stage_transcribe,
+    think=_stage_think,
+    render=_stage_render,
+    workers={
+        TRANSCRIBING: int(os.getenv("QUESTION_STT_WORKERS", str(stt_pool.workers * 2))),
+        THINKING: int(os.getenv("QUESTION_LLM_WORKERS", str(LLM_SCHEDULER.max_in_flight * 2))),
+        RENDERING: int(os.getenv("QUESTION_RENDER_WORKERS", "4")),
+    },
+    queue_size=int(os.getenv("QUESTION_QUEUE_SIZE", "64")),
+)
+
+# With a shared SESSION_STORE, every job change is published so that any worker process can
+# answer GET /questions/{job_id}; workers that don't own a job poll its record.
+QUESTION_JOB = "question_job"
+REMOTE_JOB_POLL_SECONDS = float(os.getenv("REMOTE_JOB_POLL_SECONDS", "1"))
+
+
+# one thread: the store write stays off the loop and snapshots land in the order they were taken
+_job_publisher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-publish")
+
+
+def _write_question_job(job_id: str, snapshot: Dict[str, Any], expires_at: float) -> None:
+    try:
+        session_store.set(QUESTION_JOB, job_id, snapshot, expires_at)
+    except Exception as e:
+        print(f"[WARN] Failed to publish question job {job_id}: {e}")
+
+
+def _publish_question_job(job: QuestionJob) -> None:
+    _job_publisher.submit(_write_question_job, job.job_id, job.snapshot(), time.time() + question_pipeline.retention)
+
+
+def _find_question_job(job_id: str) -> Optional[QuestionJob]:
+    job = question_pipeline.get(job_id)
+    if job is None and session_store.shared and job_id.startswith("q_"):
+        data = session_store.get(QUESTION_JOB, job_id)
+        if data is not None:
+            job = QuestionJob.from_snapshot(data)
+    return job
+
+
+@app.on_event("startup")
+async def _start_question_pipeline() -> None:
+    question_pipeline.start()
+
+
+@app.on_event("shutdown")
+async def _stop_question_pipeline() -> None:
+    await question_pipeline.stop()
+
+
+@app.get("/api/pipeline/questions")
+def question_pipeline_stats(user: str = Depends(get_current_user)) -> Dict[str, Any]:
+    return question_pipeline.stats()
+
+
 @app.post("/questions", response_model=QuestionResponse)
 async def ask_question(
         avatar_id: str = Form(""),
@@ -702,111 +1169,308 @@ async def ask_question(
         audio: UploadFile = File(...),
         avatar_url: str = Form(""),
         text: str = Form(""),
+        chunked: bool = Form(QUESTION_CHUNKED_VIDEO),
         creds: HTTPAuthorizationCredentials = Depends(security),
         user: str = Depends(get_current_user),
 ):
+    """Queue the question and return its job id at once; poll GET /questions/{job_id} for progress.
+
+    With chunked=true the reply is rendered as a playlist of short clips (see `clips` in the status).
+    """
     avatar_id = (avatar_id or "").strip()
     talking_photo_id = (talking_photo_id or "").strip()
     avatar_url = (avatar_url or "").strip()
     text = (text or "").strip()
 
-    tmp_path: Optional[str] = None
+    # the session store may be SQLite/Redis: keep its I/O off the loop
+    target = await run_in_threadpool(
+        _resolve_render_target, talking_photo_id, avatar_id, avatar_url, _token_key_from_bearer(creds)
+    )
+
+    audio_bytes = b""
     if not text:
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".webm") as tmp:
-                content = await audio.read()
-                tmp.write(content)
-                tmp_path = tmp.name
+            audio_bytes = await audio.read()
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed saving audio: {e}")
-
+            raise HTTPException(status_code=500, detail=f"Failed reading audio: {e}")
+        if not audio_bytes:
+            raise HTTPException(status_code=400, detail="Empty audio.")
+
+    job = QuestionJob(
+        user=user,
+        voice_id=voice_id,
+        render_target=target,
+        audio=audio_bytes or None,
+        text=text or None,
+        chunked=chunked,
+        on_change=_publish_question_job if session_store.shared else None,
+    )
     try:
-        student_text = text if text else transcribe_audio_file(tmp_path)  # type: ignore[arg-type]
-        tutor_reply = generate_reply_ollama(student_text)
-
-        # Priority order:
-        # 1) explicit talking_photo_id (photo avatar group id)
-        # 2) explicit avatar_id (stock HeyGen avatar)
-        # 3) legacy avatar_url (talking_photo_url)
-        # 4) session stored group_id (if present)
-        if talking_photo_id:
-            video_id = create_heygen_video_from_talking_photo_id(tutor_reply, talking_photo_id, voice_id)
-        elif avatar_id:
-            video_id = create_heygen_video_from_avatar_id(tutor_reply, avatar_id, voice_id)
-        elif avatar_url:
-            video_id = create_heygen_video_from_photo_url(tutor_reply, avatar_url, voice_id)
+        question_pipeline.submit(job)
+    except PipelineBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return QuestionResponse(job_id=job.job_id)
+
+
+def _video_status(video_id: str) -> Dict[str, Any]:
+    video = status_poller.get(video_id)
+    if video is None:
+        cached_url = render_cache.completed_url(video_id)
+        if cached_url:
+            return {"status": "completed", "video_url": cached_url}
+        video = status_poller.track(video_id)
+    return video.as_status()
+
+
+def _playlist_status(job: QuestionJob) -> QuestionStatusResponse:
+    clips: List[ClipStatus] = []
+    for index, clip in enumerate(job.clips):
+        if clip["error"]:
+            clips.append(ClipStatus(index=index, text=clip["text"], status="failed", error_message=clip["error"]))
+        elif clip["video_id"] is None:
+            clips.append(ClipStatus(index=index, text=clip["text"], status=RENDERING))
         else:
-            # try session
-            token_key = _token_key_from_bearer(creds)
-            photo_sel = _PHOTO_AVATAR_BY_TOKEN.get(token_key) or {}
-            session_group_id = (photo_sel.get("group_id") or "").strip()
-            session_photo_url = (photo_sel.get("photo_url") or "").strip()
-            if session_group_id:
-                video_id = create_heygen_video_from_talking_photo_id(tutor_reply, session_group_id, voice_id)
-            elif session_photo_url:
-                video_id = create_heygen_video_from_photo_url(tutor_reply, session_photo_url, voice_id)
-            else:
-                raise HTTPException(status_code=400, detail="Missing avatarid or talking_photo_id.")
+            st = _video_status(clip["video_id"])
+            clips.append(ClipStatus(
+                index=index,
+                text=clip["text"],
+                status=st["status"] if st["status"] in ("completed", "failed") else RENDERING,
+                video_url=st.get("video_url"),
+                error_message=st.get("error_message"),
+            ))
+
+    failed = next((c for c in clips if c.status == "failed"), None)
+    if job.status == "failed" or failed is not None:
+        status = "failed"
+    elif job.video_id is not None and all(c.status == "completed" for c in clips):
+        status = "completed"
+    else:
+        status = job.status
+    error = job.error or (failed.error_message if failed else None)
+    return QuestionStatusResponse(
+        status=status,
+        video_url=clips[0].video_url if clips else None,
+        error=error,
+        error_message=error,
+        transcript=job.text,
+        reply=job.reply,
+        clips=clips,
+    )
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Processing error ({type(e).__name__}): {e}")
-    finally:
-        if tmp_path:
-            try:
-                os.unlink(tmp_path)
-            except OSError:
-                pass
 
-    return QuestionResponse(job_id=video_id)
+def _question_status(job_id: str) -> QuestionStatusResponse:
+    """Pipeline job ids ("q_...") report their stage; after rendering, or for plain
+    HeyGen video ids, the status comes from the poller's job table."""
+    job = _find_question_job(job_id)
+    if job is not None and job.chunked:
+        return _playlist_status(job)
+    if job is not None and job.video_id is None:
+        return QuestionStatusResponse(
+            status=job.status,
+            error=job.error,
+            error_message=job.error,
+            transcript=job.text,
+            reply=job.reply,
+        )
+
+    if job is None:
+        return QuestionStatusResponse(**_video_status(job_id))
+    status = _video_status(job.video_id)
+    if status["status"] not in ("completed", "failed"):
+        status["status"] = RENDERING
+    return QuestionStatusResponse(**status, transcript=job.text, reply=job.reply)
+
+
+def _question_versions(job_id: str) -> Dict[str, int]:
+    """Versions of everything the status is built from: the pipeline job and its video(s)."""
+    job = _find_question_job(job_id)
+    if job is None:
+        video_ids = [job_id]
+    else:
+        video_ids = [c["video_id"] for c in job.clips if c["video_id"]] or ([job.video_id] if job.video_id else [])
+    seen = {"": job.version} if job is not None and not job.finished else {}
+    for video_id in video_ids:
+        video = status_poller.get(video_id)
+        if video is not None and not video.done:
+            seen[video_id] = video.version
+    return seen
+
+
+async def _question_changed(job_id: str, seen: Dict[str, int]) -> None:
+    job = question_pipeline.get(job_id)
+    waiters = []
+    for key, version in seen.items():
+        if key == "":
+            if job is not None:
+                waiters.append(asyncio.ensure_future(job.wait_changed(version)))
+            else:
+                # owned by another worker process: re-read its published record
+                waiters.append(asyncio.ensure_future(asyncio.sleep(REMOTE_JOB_POLL_SECONDS)))
+        else:
+            waiters.append(asyncio.ensure_future(status_poller.wait_changed(key, version)))
+    if not waiters:
+        await asyncio.sleep(1)
+        return
+    try:
+        await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for waiter in waiters:
+            waiter.cancel()
 
 
 @app.get("/questions/{job_id}", response_model=QuestionStatusResponse)
 def get_question_status(job_id: str, user: str = Depends(get_current_user)):
+    """Answered from memory; HeyGen is only contacted by the background poller."""
+    return _question_status(job_id)
+
+
+@app.get("/questions/{job_id}/events")
+async def question_status_events(job_id: str, user: str = Depends(get_current_user)) -> StreamingResponse:
+    """Server-sent events: one `data:` message per status change, closed once the video is completed/failed."""
+
+    def _snapshot() -> Tuple[QuestionStatusResponse, Dict[str, int]]:
+        return _question_status(job_id), _question_versions(job_id)
+
+    async def _events():
+        last = None
+        while True:
+            # jobs of other worker processes are read from the (blocking) session store
+            status, seen = await run_in_threadpool(_snapshot) if session_store.shared else _snapshot()
+            payload = status.model_dump_json()
+            if payload != last:
+                last = payload
+                yield f"data: {payload}\n\n"
+                if status.status in ("completed", "failed"):
+                    return
+            try:
+                await asyncio.wait_for(_question_changed(job_id, seen), timeout=15)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(
+        _events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Live transcription: 16 kHz mono PCM is streamed in, VAD cuts it at pauses
+STREAM_SAMPLE_RATE = 16000
+STREAM_MAX_SECONDS = float(os.getenv("STREAM_MAX_SECONDS", "300"))
+
+
+@app.websocket("/ws/questions/transcribe")
+async def transcribe_stream(websocket: WebSocket, token: str = "", format: str = "s16le"):
+    """Incremental transcription while the student is still speaking.
+
+    Browsers cannot set headers on WebSockets, so the JWT goes in `?token=`.
+    Client -> server: binary frames of 16 kHz mono PCM (`format=s16le`, the
+    default, or `f32le`), then a text frame `{"type": "end", "reply": bool}`.
+    Server -> client: `{"type": "partial", "segment", "text", "transcript"}`
+    for every utterance as soon as it is transcribed, one `{"type": "final",
+    "text"}` after "end", and, with reply=true, the tutor's answer as
+    `{"type": "token"}` messages followed by `{"type": "done"}`.
+    """
     try:
-        data = get_heygen_status(job_id)
+        user = username_from_token(token)
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+
+    dtype = np.float32 if format == "f32le" else np.int16
+    scale = 1.0 if dtype is np.float32 else 1 / 32768.0
+    segmenter = SpeechSegmenter(sample_rate=STREAM_SAMPLE_RATE)
+    segments: List[asyncio.Task] = []
+    texts: List[str] = []
+    received = 0
+    # frames may split a sample; the odd bytes are carried into the next frame
+    pending = b""
+
+    async def _transcribe_segment(audio: np.ndarray) -> str:
+        try:
+            return await stt_pool.transcribe(audio, timeout=STT_TIMEOUT_SECONDS)
+        except NoSpeech:
+            # silence/noise that slipped past the VAD
+            return ""
+
+    async def _send_partials() -> None:
+        while len(texts) < len(segments) and segments[len(texts)].done():
+            text = segments[len(texts)].result()
+            texts.append(text)
+            if text:
+                await websocket.send_json({
+                    "type": "partial",
+                    "segment": len(texts) - 1,
+                    "text": text,
+                    "transcript": " ".join(t for t in texts if t),
+                })
+
+    def _start(segment: Optional[np.ndarray]) -> None:
+        if segment is not None:
+            segments.append(asyncio.create_task(_transcribe_segment(segment)))
+
+    want_reply = False
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("bytes") is not None:
+                data = message["bytes"]
+                received += len(data)
+                if received / np.dtype(dtype).itemsize / STREAM_SAMPLE_RATE > STREAM_MAX_SECONDS:
+                    await websocket.send_json({"type": "error", "detail": "Recording too long."})
+                    break
+                data = pending + data
+                whole = len(data) - len(data) % np.dtype(dtype).itemsize
+                pending = data[whole:]
+                pcm = np.frombuffer(data[:whole], dtype=dtype)
+                for segment in segmenter.feed(pcm.astype(np.float32) * scale):
+                    _start(segment)
+                # audio keeps arriving while the student talks, so partials go out promptly
+                await _send_partials()
+                continue
+            try:
+                control = json.loads(message.get("text") or "{}")
+            except ValueError:
+                continue
+            if control.get("type") == "end":
+                want_reply = bool(control.get("reply"))
+                break
+
+        _start(segmenter.flush())
+        if segments:
+            await asyncio.gather(*segments)
+        await _send_partials()
+        transcript = " ".join(t for t in texts if t).strip()
+        await websocket.send_json({"type": "final", "text": transcript})
+
+        if want_reply and transcript:
+            async for event in reply_events(transcript, user):
+                if "token" in event:
+                    await websocket.send_json({"type": "token", "token": event["token"]})
+                elif "error" in event:
+                    await websocket.send_json({"type": "error", "detail": event["error"]})
+                    break
+            else:
+                await websocket.send_json({"type": "done"})
+        await websocket.close()
+    except WebSocketDisconnect:
+        for task in segments:
+            task.cancel()
+    except (TranscriptionBusy, asyncio.TimeoutError) as e:
+        for task in segments:
+            task.cancel()
+        await websocket.send_json({"type": "error", "detail": str(e) or "Transcription timed out."})
+        await websocket.close(code=1013)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"HeyGen error: {e}")
-
-    status = (data.get("status") or "unknown").lower()
-    completed_statuses = {"completed", "complete", "success", "done", "finished"}
-    failed_statuses = {"failed", "error", "canceled", "cancelled"}
-
-    video_url = data.get("video_url") or data.get("url")
-    raw_error = data.get("error") or data.get("message")
-
-    def _stringify_err(v: Any) -> Optional[str]:
-        if v is None:
-            return None
-        if isinstance(v, str):
-            return v
-        # common HeyGen format: {"code": "...", "message": "..."}
-        if isinstance(v, dict):
-            msg = v.get("message") or v.get("msg")
-            code = v.get("code")
-            if code and msg:
-                return f"{code}: {msg}"
-            if msg:
-                return str(msg)
-            return str(v)
-        return str(v)
-
-    error_message = _stringify_err(raw_error)
-
-    out_status = status
-    if status in completed_statuses or (video_url and status not in failed_statuses):
-        out_status = "completed"
-    elif status in failed_statuses:
-        out_status = "failed"
-
-    return QuestionStatusResponse(
-        status=out_status,
-        video_url=video_url,
-        error=raw_error,
-        error_message=error_message,
-        raw_status=data,
-    )
+        # a broken STT engine (load or decode failure) is reported, not passed off as silence
+        for task in segments:
+            task.cancel()
+        with contextlib.suppress(Exception):
+            await websocket.send_json({"type": "error", "detail": f"Transcription failed: {type(e).__name__}: {e}"})
+            await websocket.close(code=1011)
 
 
 class ChatRequest(BaseModel):
@@ -815,6 +1479,14 @@ class ChatRequest(BaseModel):
 
 class QuizRequest(BaseModel):
     description: str
+    # generate the outline first, then all questions concurrently (default: QUIZ_PARALLEL)
+    parallel: Optional[bool] = None
+
+
+class QuizOutline(BaseModel):
+    quizName: str
+    subject: str
+    topics: List[str] = Field(min_length=1)
 
 
 class ChatResponse(BaseModel):
@@ -867,7 +1539,7 @@ def _require_liveavatar_key() -> str:
 
 
 @app.post("/api/livechat/token", response_model=LiveAvatarTokenResponse)
-def livechat_create_session_token(
+async def livechat_create_session_token(
         req: LiveAvatarTokenRequest,
         user: str = Depends(get_current_user),
 ) -> LiveAvatarTokenResponse:
@@ -922,8 +1594,10 @@ def livechat_create_session_token(
     }
 
     try:
-        resp = requests.post(f"{LIVEAVATAR_BASE_URL}/v1/sessions/token", json=payload, headers=headers, timeout=30)
-        if not resp.ok:
+        resp = await get_async_client(LIVEAVATAR_BASE_URL).post(
+            f"{LIVEAVATAR_BASE_URL}/v1/sessions/token", json=payload, headers=headers, timeout=async_timeout(30)
+        )
+        if not resp.is_success:
             raise HTTPException(status_code=resp.status_code, detail=resp.text)
         raw = resp.json() or {}
         data = raw.get("data") or {}
@@ -938,8 +1612,27 @@ def livechat_create_session_token(
         raise HTTPException(status_code=502, detail=f"LiveAvatar token error: {type(e).__name__}: {e}")
 
 
+# Fallback agent lifetime (seconds) when LiveAvatar reports no max_session_duration; 0 = unlimited
+AGENT_MAX_SESSION_SECONDS = float(os.getenv("AGENT_MAX_SESSION_SECONDS", "3600"))
+LIVECHAT_SESSION = "livechat_session"
+
+
+def _remember_livechat_session(session_id: str, max_session_duration: Optional[int]) -> None:
+    lifetime = max_session_duration or AGENT_MAX_SESSION_SECONDS or 24 * 3600
+    session_store.set(
+        LIVECHAT_SESSION, session_id,
+        {"max_session_duration": max_session_duration},
+        time.time() + lifetime + 300,
+    )
+
+
+def _agent_max_duration(session_id: str, requested: Optional[int]) -> Optional[float]:
+    stored = (session_store.get(LIVECHAT_SESSION, session_id) or {}).get("max_session_duration")
+    return float(requested or stored or AGENT_MAX_SESSION_SECONDS) or None
+
+
 @app.post("/api/livechat/start", response_model=LiveAvatarStartResponse)
-def livechat_start(
+async def livechat_start(
         session_token: str = Form(""),
         user: str = Depends(get_current_user),
 ) -> LiveAvatarStartResponse:
@@ -953,8 +1646,10 @@ def livechat_start(
     }
 
     try:
-        resp = requests.post(f"{LIVEAVATAR_BASE_URL}/v1/sessions/start", headers=headers, timeout=30)
-        if not resp.ok:
+        resp = await get_async_client(LIVEAVATAR_BASE_URL).post(
+            f"{LIVEAVATAR_BASE_URL}/v1/sessions/start", headers=headers, timeout=async_timeout(30)
+        )
+        if not resp.is_success:
             raise HTTPException(status_code=resp.status_code, detail=resp.text)
         raw = resp.json() or {}
         data = raw.get("data") or {}
@@ -963,6 +1658,7 @@ def livechat_start(
         livekit_client_token = data.get("livekit_client_token")
         if not session_id or not livekit_url or not livekit_client_token:
             raise HTTPException(status_code=502, detail=f"Unexpected LiveAvatar response: {raw}")
+        await run_in_threadpool(_remember_livechat_session, session_id, data.get("max_session_duration"))
         return LiveAvatarStartResponse(
             session_id=session_id,
             livekit_url=livekit_url,
@@ -978,7 +1674,7 @@ def livechat_start(
 
 
 @app.post("/api/livechat/stop", response_model=LiveAvatarStopResponse)
-def livechat_stop(
+async def livechat_stop(
         req: LiveAvatarStopRequest,
         user: str = Depends(get_current_user),
 ) -> LiveAvatarStopResponse:
@@ -995,8 +1691,10 @@ def livechat_stop(
     }
 
     try:
-        resp = requests.post(f"{LIVEAVATAR_BASE_URL}/v1/sessions/stop", json=payload, headers=headers, timeout=30)
-        if not resp.ok:
+        resp = await get_async_client(LIVEAVATAR_BASE_URL).post(
+            f"{LIVEAVATAR_BASE_URL}/v1/sessions/stop", json=payload, headers=headers, timeout=async_timeout(30)
+        )
+        if not resp.is_success:
             raise HTTPException(status_code=resp.status_code, detail=resp.text)
         return LiveAvatarStopResponse(ok=True)
     except HTTPException:
@@ -1006,14 +1704,27 @@ def livechat_stop(
 
 
 @app.post("/chat", response_model=ChatResponse)
-def chat(req: ChatRequest, user: str = Depends(get_current_user)) -> ChatResponse:
+async def chat(req: ChatRequest, user: str = Depends(get_current_user)) -> ChatResponse:
     text = (req.text or "").strip()
     if not text:
         raise HTTPException(status_code=400, detail="Empty text.")
-    reply = generate_reply_ollama(text)
+    reply = await generate_reply_ollama(text, user)
     return ChatResponse(text=reply)
 
 
+@app.post("/chat/stream")
+async def chat_stream(req: ChatRequest, user: str = Depends(get_current_user)) -> StreamingResponse:
+    """Same as /chat, but tokens are forwarded as newline-delimited JSON while they are generated."""
+    text = (req.text or "").strip()
+    if not text:
+        raise HTTPException(status_code=400, detail="Empty text.")
+    return StreamingResponse(
+        stream_reply_ollama(text, user),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 def clean_json_string(raw_string: str) -> str:
     """
     Curăță răspunsul LLM-ului.
@@ -1032,17 +1743,271 @@ def clean_json_string(raw_string: str) -> str:
     return cleaned.strip()
 
 
+# Ollama constrains generation to these schemas, so the reply is always well-formed JSON.
+QUIZ_SCHEMA = QuizResponse.model_json_schema()
+QUIZ_QUESTION_SCHEMA = Question.model_json_schema()
+QUIZ_OUTLINE_SCHEMA = QuizOutline.model_json_schema()
+QUIZ_REGENERATE_ATTEMPTS = int(os.getenv("QUIZ_REGENERATE_ATTEMPTS", "2"))
+QUIZ_PARALLEL = os.getenv("QUIZ_PARALLEL", "0") == "1"
+QUIZ_MAX_QUESTIONS = int(os.getenv("QUIZ_MAX_QUESTIONS", "20"))
+
+
+def _parse_question(raw: str) -> Optional[Question]:
+    for candidate in (raw, clean_json_string(raw)):
+        try:
+            return Question.model_validate_json(candidate)
+        except ValidationError:
+            continue
+    return None
+
+
+async def _generate_question(description: str, topic: str, existing: List[str]) -> Question:
+    prompt = (
+        f"Quiz description: {description}\n"
+        f"Topic: {topic}\n"
+        f"Other questions: {json.dumps(existing, ensure_ascii=False)}"
+    )
+    for _ in range(QUIZ_REGENERATE_ATTEMPTS):
+        try:
+            reply = await model.ask(
+                prompt, key="quiz", format=QUIZ_QUESTION_SCHEMA, system=QUIZ_QUESTION_PROMPT, kind="quiz_question"
+            )
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=f"LLM error ({type(e).__name__}): {e}")
+        question = _parse_question(reply)
+        if question is not None:
+            return question
+    raise HTTPException(status_code=502, detail="LLM kept producing an invalid quiz question.")
+
+
+async def quiz_events(description: str):
+    """{"quiz": {...}} once the title is known, {"index": i, "question": {...}} per question as soon
+    as it validates, then {"done": true} (or a single {"error": ...}).
+
+    An invalid question is regenerated on its own while the rest of the quiz keeps streaming,
+    so regenerated questions may arrive out of order; clients place them by index.
+    """
+    parser = QuizStreamParser()
+    seen_texts: List[str] = []
+    regenerating: Dict[asyncio.Task, int] = {}
+    header_sent = False
+    count = 0
+
+    def header_event() -> Dict[str, Any]:
+        return {"quiz": {
+            "quizName": parser.header.get("quizName") or "Quiz",
+            "subject": parser.header.get("subject") or "",
+        }}
+
+    def regenerated_event(task: asyncio.Task) -> Dict[str, Any]:
+        index = regenerating.pop(task)
+        question = task.result()
+        seen_texts.append(question.questionText)
+        return {"index": index, "question": question.model_dump(), "regenerated": True}
+
+    try:
+        try:
+            async for token in model.stream(
+                    description, key="quiz", format=QUIZ_SCHEMA, system=QUIZ_PROMPT, kind="quiz"
+            ):
+                items = parser.feed(token)
+                if parser.questions_started and not header_sent:
+                    header_sent = True
+                    yield header_event()
+                for raw in items:
+                    index, count = count, count + 1
+                    question = _parse_question(raw)
+                    if question is None:
+                        task = asyncio.create_task(_generate_question(description, description, list(seen_texts)))
+                        regenerating[task] = index
+                        continue
+                    seen_texts.append(question.questionText)
+                    yield {"index": index, "question": question.model_dump()}
+                for task in [t for t in regenerating if t.done()]:
+                    yield regenerated_event(task)
+        except HTTPException:
+            # a failed regeneration already carries its message
+            raise
+        except Exception as e:
+            yield {"error": f"LLM error ({type(e).__name__}): {e}"}
+            return
+
+        parser.finish()
+        if not header_sent:
+            yield header_event()
+        if count == 0:
+            yield {"error": "LLM returned no quiz questions."}
+            return
+        while regenerating:
+            done, _ = await asyncio.wait(list(regenerating), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield regenerated_event(task)
+        yield {"done": True}
+    except HTTPException as e:
+        yield {"error": e.detail}
+    finally:
+        for task in regenerating:
+            task.cancel()
+
+
+async def _generate_outline(description: str) -> QuizOutline:
+    for _ in range(QUIZ_REGENERATE_ATTEMPTS):
+        try:
+            reply = await model.ask(
+                description, key="quiz", format=QUIZ_OUTLINE_SCHEMA, system=QUIZ_OUTLINE_PROMPT, kind="quiz_outline"
+            )
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=f"LLM error ({type(e).__name__}): {e}")
+        try:
+            return QuizOutline.model_validate_json(reply)
+        except ValidationError:
+            continue
+    raise HTTPException(status_code=502, detail="LLM kept producing an invalid quiz outline.")
+
+
+async def parallel_quiz_events(description: str):
+    """Same events as quiz_events(), but the quiz is planned first (name, subject, one topic
+    per question) and the questions are then generated as concurrent Ollama requests.
+
+    How many actually run at once is decided by the LLM scheduler (OLLAMA_NUM_PARALLEL),
+    so wall-clock time drops roughly by that factor. Questions arrive in completion order.
+    """
+    tasks: Dict[asyncio.Task, int] = {}
+    try:
+        outline = await _generate_outline(description)
+        yield {"quiz": {"quizName": outline.quizName, "subject": outline.subject}}
+
+        topics = outline.topics[:QUIZ_MAX_QUESTIONS]
+        for index, topic in enumerate(topics):
+            others = topics[:index] + topics[index + 1:]
+            tasks[asyncio.create_task(_generate_question(description, topic, others))] = index
+        while tasks:
+            done, _ = await asyncio.wait(list(tasks), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index = tasks.pop(task)
+                yield {"index": index, "question": task.result().model_dump()}
+        yield {"done": True}
+    except HTTPException as e:
+        yield {"error": e.detail}
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+quiz_bank = QuizBank(
+    os.getenv("QUIZ_BANK_PATH", "quiz_bank.sqlite3"),
+    max_questions=int(os.getenv("QUIZ_BANK_MAX_QUESTIONS", "200")),
+    # a description is served from the bank only once it has this many different quizzes
+    min_quizzes=int(os.getenv("QUIZ_BANK_MIN_QUIZZES", "3")),
+    ttl_seconds=float(os.getenv("QUIZ_BANK_TTL_SECONDS", str(7 * 24 * 3600))),
+)
+# quizzes generated per subject in the background at startup (0 disables)
+QUIZ_BANK_PREWARM_QUIZZES = int(os.getenv("QUIZ_BANK_PREWARM_QUIZZES", "3"))
+_quiz_bank_prewarm: Optional[asyncio.Task] = None
+
+
+async def banked_quiz_events(description: str, parallel: bool = QUIZ_PARALLEL):
+    """quiz_events(), served from the quiz bank when it has the description/subject;
+    a freshly generated quiz is added to the bank once it is complete."""
+    key = bank_key_for(description)
+    banked = await run_in_threadpool(quiz_bank.get, key)
+    if banked is not None:
+        yield {"quiz": {"quizName": banked["quizName"], "subject": banked["subject"]}, "cached": True}
+        for index, question in enumerate(banked["questions"]):
+            yield {"index": index, "question": question}
+        yield {"done": True}
+        return
+
+    quiz: Dict[str, Any] = {}
+    questions: Dict[int, Dict[str, Any]] = {}
+    generate = parallel_quiz_events if parallel else quiz_events
+    async for event in generate(description):
+        if "quiz" in event:
+            quiz = event["quiz"]
+        elif "question" in event:
+            questions[event["index"]] = event["question"]
+        elif event.get("done"):
+            banked_quiz = {**quiz, "questions": [questions[i] for i in sorted(questions)]}
+            await run_in_threadpool(quiz_bank.add, key, banked_quiz)
+        yield event
+
+
+async def _collect_quiz(events) -> Dict[str, Any]:
+    quiz: Dict[str, Any] = {}
+    questions: Dict[int, Dict[str, Any]] = {}
+    async for event in events:
+        if "error" in event:
+            raise HTTPException(status_code=502, detail=event["error"])
+        if "quiz" in event:
+            quiz = event["quiz"]
+        elif "question" in event:
+            questions[event["index"]] = event["question"]
+    return {**quiz, "questions": [questions[i] for i in sorted(questions)]}
+
+
+async def _prewarm_quiz_bank() -> None:
+    target = max(QUIZ_BANK_PREWARM_QUIZZES, quiz_bank.min_quizzes)
+    for key, subject in SUBJECTS.items():
+        # every worker process runs this at startup: one of them (the claim holder) fills each subject
+        if not await run_in_threadpool(quiz_bank.claim_prewarm, key):
+            continue
+        try:
+            while await run_in_threadpool(quiz_bank.quiz_count, key) < target:
+                try:
+                    generate = parallel_quiz_events if QUIZ_PARALLEL else quiz_events
+                    quiz = await _collect_quiz(generate(subject["description"]))
+                except HTTPException as e:
+                    print(f"[WARN] Quiz bank pre-warm failed for {key}: {e.detail}")
+                    break
+                await run_in_threadpool(quiz_bank.add, key, quiz)
+                await run_in_threadpool(quiz_bank.claim_prewarm, key)
+        finally:
+            await run_in_threadpool(quiz_bank.release_prewarm, key)
+
+
+@app.on_event("startup")
+async def _start_quiz_bank_prewarm() -> None:
+    global _quiz_bank_prewarm
+    if QUIZ_BANK_PREWARM_QUIZZES > 0:
+        _quiz_bank_prewarm = asyncio.create_task(_prewarm_quiz_bank())
+
+
+@app.on_event("shutdown")
+async def _stop_quiz_bank_prewarm() -> None:
+    if _quiz_bank_prewarm is not None:
+        _quiz_bank_prewarm.cancel()
+
+
+@app.get("/api/cache/quizzes")
+def quiz_bank_stats(user: str = Depends(get_current_user)) -> Dict[str, Any]:
+    return quiz_bank.stats()
+
+
 @app.post("/quiz", response_model=QuizResponse)
-def chat(req: QuizRequest) -> QuizResponse:
-    text = (req.description or "").strip()
-    text = QUIZ_PROMPT + text
-    if not text:
+async def chat(req: QuizRequest) -> QuizResponse:
+    description = (req.description or "").strip()
+    if not description:
         raise HTTPException(status_code=400, detail="Empty text.")
-    reply = generate_reply_ollama(text)
-    cleaned_json = clean_json_string(reply)
-    quiz_data = json.loads(cleaned_json)
+    # served from the quiz bank (a random mix of stored questions) when possible;
+    # generation never goes through the answer cache
+    parallel = QUIZ_PARALLEL if req.parallel is None else req.parallel
+    return QuizResponse(**await _collect_quiz(banked_quiz_events(description, parallel)))
 
-    return quiz_data
+
+@app.post("/quiz/stream")
+async def quiz_stream(req: QuizRequest) -> StreamingResponse:
+    """Same as /quiz, but each question is sent as a newline-delimited JSON event once it validates."""
+    description = (req.description or "").strip()
+    if not description:
+        raise HTTPException(status_code=400, detail="Empty text.")
+
+    parallel = QUIZ_PARALLEL if req.parallel is None else req.parallel
+
+    async def _lines():
+        async for event in banked_quiz_events(description, parallel):
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(_lines(), media_type="application/x-ndjson")
 
 
 class VideoFromChatResponse(BaseModel):
@@ -1050,7 +2015,7 @@ class VideoFromChatResponse(BaseModel):
 
 
 @app.post("/api/video/from-chat", response_model=VideoFromChatResponse)
-def video_from_chat(
+async def video_from_chat(
         req: ChatRequest,
         creds: HTTPAuthorizationCredentials = Depends(security),
         user: str = Depends(get_current_user),
@@ -1061,27 +2026,27 @@ def video_from_chat(
     if not chat_text:
         raise HTTPException(status_code=400, detail="Empty text.")
 
-    sel = _SELECTION_BY_TOKEN.get(token_key) or {}
+    sel = await run_in_threadpool(session_store.get, SELECTION, token_key) or {}
     voice_id = ((sel.get("voice") or {}).get("id") or "").strip()
     if not voice_id:
         raise HTTPException(status_code=400, detail="No voice selected.")
 
-    photo_sel = _PHOTO_AVATAR_BY_TOKEN.get(token_key)
+    photo_sel = await run_in_threadpool(session_store.get, PHOTO_AVATAR, token_key)
     if not photo_sel:
         raise HTTPException(status_code=400, detail="No photo avatar selected.")
 
-    reply = generate_reply_ollama(chat_text)
+    reply = await generate_reply_ollama(chat_text, user)
 
     group_id = (photo_sel.get("group_id") or "").strip()
     if group_id:
-        video_id = create_heygen_video_from_talking_photo_id(reply, group_id, voice_id)
+        video_id = await run_in_threadpool(create_heygen_video_from_talking_photo_id, reply, group_id, voice_id)
         return VideoFromChatResponse(job_id=video_id)
 
     photo_url = (photo_sel.get("photo_url") or "").strip()
     if not photo_url:
         raise HTTPException(status_code=400, detail="Invalid stored photo avatar.")
 
-    video_id = create_heygen_video_from_photo_url(reply, photo_url, voice_id)
+    video_id = await run_in_threadpool(create_heygen_video_from_photo_url, reply, photo_url, voice_id)
     return VideoFromChatResponse(job_id=video_id)
 
 
@@ -1092,7 +2057,7 @@ def _heygen_post_generate(payload: dict) -> dict:
         "Accept": "application/json",
     }
     try:
-        resp = requests.post(HEYGEN_GENERATE_URL, json=payload, headers=headers, timeout=60)
+        resp = HTTP.post(HEYGEN_GENERATE_URL, json=payload, headers=headers, timeout=http_timeout(60))
         if not resp.ok:
             raise HTTPException(
                 status_code=502,
@@ -1107,61 +2072,101 @@ def _heygen_post_generate(payload: dict) -> dict:
 
 # --- NEW: LiveKit Agent control endpoints ---
 
+# AGENT_BACKEND=inprocess (default): agents run on this server's loop.
+# AGENT_BACKEND=workers: agents run in the `python -m app.agent_worker` pool and the
+# endpoints below only dispatch jobs over the local queue (AGENT_QUEUE_PATH).
+AGENT_BACKEND = os.getenv("AGENT_BACKEND", "inprocess").strip().lower()
+if AGENT_BACKEND == "workers":
+    agent_queue: Optional[AgentQueue] = AgentQueue(
+        os.getenv("AGENT_QUEUE_PATH", "agent_queue.sqlite3"),
+        stale_after=float(os.getenv("AGENT_WORKER_STALE_SECONDS", "15")),
+    )
+    agents = AgentDispatcher(agent_queue)
+elif AGENT_BACKEND == "inprocess":
+    agent_queue = None
+    agents = AGENT_MANAGER
+else:
+    raise ValueError(f"Unknown AGENT_BACKEND {AGENT_BACKEND!r}; use inprocess or workers")
+
+_agent_registry: Optional[asyncio.Task] = None
+
+
+@app.on_event("startup")
+async def _start_agent_registry() -> None:
+    # with several worker processes, agents are visible (and stoppable) from every worker
+    global _agent_registry
+    if agent_queue is None and session_store.shared:
+        AGENT_MANAGER.use_registry(session_store)
+        _agent_registry = asyncio.create_task(AGENT_MANAGER.run_registry())
+
+
+@app.on_event("shutdown")
+async def _stop_agents() -> None:
+    if _agent_registry is not None:
+        _agent_registry.cancel()
+    # leave no LiveKit rooms connected behind (the worker pool keeps its own)
+    await agents.stop_all()
+
+
 class LiveAvatarAgentStartRequest(BaseModel):
     session_id: str
     livekit_url: str
     livekit_agent_token: str
     avatar_id: Optional[str] = None
+    # seconds; defaults to what /api/livechat/start reported for the session
+    max_session_duration: Optional[int] = None
 
 
 class LiveAvatarAgentStatusResponse(BaseModel):
     running: bool
 
 
+AGENT_CONNECT_TIMEOUT = float(os.getenv("AGENT_CONNECT_TIMEOUT", "20"))
+
+
 @app.post("/api/livechat/agent/start", response_model=LiveAvatarStopResponse)
-def livechat_agent_start(
+async def livechat_agent_start(
         req: LiveAvatarAgentStartRequest,
         user: str = Depends(get_current_user),
 ) -> LiveAvatarStopResponse:
     avatar_id = (req.avatar_id or HEYGEN_LIVEAVATAR_AVATAR_ID).strip()
+    max_duration = await run_in_threadpool(_agent_max_duration, req.session_id, req.max_session_duration)
 
-    # Kick off agent in background (in-process).
+    # Runs the agent in-process or hands it to the worker pool; returns once it has joined the room.
     # Important: this agent participant publishes avatar A/V tracks.
-    import asyncio
     try:
-        loop = asyncio.get_event_loop()
-    except RuntimeError:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-
-    loop.create_task(
-        AGENT_MANAGER.start(
+        await agents.start(
             livekit_url=req.livekit_url,
             livekit_agent_token=req.livekit_agent_token,
             avatar_id=avatar_id,
             session_id=req.session_id,
+            timeout=AGENT_CONNECT_TIMEOUT,
+            max_session_duration=max_duration,
         )
-    )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="LiveAvatar agent did not connect in time.")
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"LiveAvatar agent error: {type(e).__name__}: {e}")
 
     return LiveAvatarStopResponse(ok=True)
 
 
 @app.get("/api/livechat/agent/status/{session_id}", response_model=LiveAvatarAgentStatusResponse)
 def livechat_agent_status(session_id: str, user: str = Depends(get_current_user)) -> LiveAvatarAgentStatusResponse:
-    return LiveAvatarAgentStatusResponse(running=AGENT_MANAGER.is_running(session_id))
+    return LiveAvatarAgentStatusResponse(running=agents.is_running(session_id))
 
 
 @app.post("/api/livechat/agent/stop", response_model=LiveAvatarStopResponse)
-def livechat_agent_stop(
+async def livechat_agent_stop(
         req: LiveAvatarStopRequest,
         user: str = Depends(get_current_user),
 ) -> LiveAvatarStopResponse:
-    import asyncio
-    try:
-        loop = asyncio.get_event_loop()
-    except RuntimeError:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-
-    loop.create_task(AGENT_MANAGER.stop(req.session_id))
+    await agents.stop(req.session_id)
     return LiveAvatarStopResponse(ok=True)
+
+
+@app.get("/api/livechat/agents")
+def livechat_agents(user: str = Depends(get_current_user)) -> Dict[str, Any]:
+    if agent_queue is None:
+        return {"backend": "inprocess", "running": len(AGENT_MANAGER.sessions())}
+    return agents.stats()
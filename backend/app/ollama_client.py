@@ -1,11 +1,14 @@
+import os
+import time
+from collections import deque
+
 import ollama
 
-class OllamaTeacher:
-    def __init__(self):
-        self.name = 'math-llama'
+# How long Ollama keeps the model loaded after a request ("30m", "-1" = forever, "0" = unload).
+_keep_alive = os.getenv("OLLAMA_KEEP_ALIVE", "30m").strip()
+OLLAMA_KEEP_ALIVE = float(_keep_alive) if _keep_alive.lstrip("-").replace(".", "", 1).isdigit() else _keep_alive
 
-    def ask(self, question):
-        system_prompt  = """You are a deterministic mathematical engine. You are not a chat assistant. You do not think, you only calculate and output.
+SYSTEM_PROMPT = """You are a deterministic mathematical engine. You are not a chat assistant. You do not think, you only calculate and output.
 
 STRICT OUTPUT PROTOCOL:
 1. DISABLE ALL INTERNAL MONOLOGUE. Do not use <think>, <thought>, or <<...>> tags.
@@ -25,25 +28,115 @@ CLASSIFICATION & FORMAT:
 Generate the response for the following input immediately:
 """
 
-        try:
-            stream = ollama.chat(
+
+def _messages(question, system=SYSTEM_PROMPT):
+    # the system prompt is static and always first, so Ollama can reuse its KV cache
+    # across requests and only has to evaluate the user message
+    return [
+        {'role': 'system', 'content': system},
+        {'role': 'user', 'content': question},
+    ]
+
+
+def _timings(chunk):
+    """Ollama's counters from the final chunk; durations are reported in nanoseconds."""
+    def ms(name):
+        return round((chunk.get(name) or 0) / 1e6, 1)
+
+    return {
+        'prompt_tokens': chunk.get('prompt_eval_count') or 0,
+        'prompt_eval_ms': ms('prompt_eval_duration'),
+        'eval_tokens': chunk.get('eval_count') or 0,
+        'eval_ms': ms('eval_duration'),
+        'load_ms': ms('load_duration'),
+        'total_ms': ms('total_duration'),
+    }
+
+
+class LLMTimings:
+    """Rolling window of per-request timings, grouped by prompt kind ("chat", "quiz", ...).
+
+    A low prompt_eval_ms relative to the prompt size means Ollama reused the
+    cached system-prompt prefix instead of evaluating it again.
+    """
+
+    def __init__(self, window=200):
+        self._recent = deque(maxlen=window)
+
+    def record(self, kind, timings):
+        self._recent.append({'kind': kind, 'at': time.time(), **timings})
+
+    def stats(self):
+        kinds = {}
+        for entry in self._recent:
+            kinds.setdefault(entry['kind'], []).append(entry)
+        summary = {}
+        for kind, entries in kinds.items():
+            n = len(entries)
+            eval_ms = sum(e['eval_ms'] for e in entries)
+            summary[kind] = {
+                'requests': n,
+                'avg_prompt_tokens': round(sum(e['prompt_tokens'] for e in entries) / n, 1),
+                'avg_prompt_eval_ms': round(sum(e['prompt_eval_ms'] for e in entries) / n, 1),
+                'avg_eval_ms': round(eval_ms / n, 1),
+                'eval_tokens_per_s': round(sum(e['eval_tokens'] for e in entries) / (eval_ms / 1000), 1) if eval_ms else None,
+                'avg_load_ms': round(sum(e['load_ms'] for e in entries) / n, 1),
+            }
+        return {'keep_alive': OLLAMA_KEEP_ALIVE, 'kinds': summary, 'recent': list(self._recent)[-10:]}
+
+
+class AsyncOllamaTeacher:
+    """Ollama client for the API.
+
+    Uses ollama.AsyncClient so a generation never blocks the event loop, and
+    goes through an LLMScheduler so only a bounded number of generations hit
+    Ollama at the same time.
+    """
+
+    def __init__(self, scheduler):
+        self.name = 'math-llama'
+        self.client = ollama.AsyncClient()
+        self.scheduler = scheduler
+        self.timings = LLMTimings()
+
+    async def stream(self, question, key="", format=None, system=SYSTEM_PROMPT, kind="chat", timings=None):
+        """`format` is passed to Ollama: "json" or a JSON schema the reply is constrained to.
+
+        `system` holds the static instructions; everything request-specific belongs in
+        `question`. If a `timings` dict is given, it is filled with Ollama's counters.
+        """
+        async with self.scheduler.slot(key):
+            stream = await self.client.chat(
                 model=self.name,
-                messages=[
-                    {'role': 'system', 'content': system_prompt},
-                    {'role': 'user', 'content': question},
-                ],
+                messages=_messages(question, system),
                 stream=True,
+                format=format,
+                keep_alive=OLLAMA_KEEP_ALIVE,
             )
-
-            full_response = ""
-            for chunk in stream:
+            async for chunk in stream:
                 content = chunk['message']['content']
-                print(content, end="", flush=True)
-                full_response += content
+                if content:
+                    yield content
+                if chunk.get('done'):
+                    done = _timings(chunk)
+                    self.timings.record(kind, done)
+                    if timings is not None:
+                        timings.update(done)
 
-            print("\n" + "-" * 50)
-            return full_response
+    async def ask(self, question, key="", format=None, system=SYSTEM_PROMPT, kind="chat"):
+        return "".join([token async for token in self.stream(question, key, format, system, kind)])
 
-        except Exception as e:
-            print(f"\n\n cannot connect to ollama server")
-            print(f"details: {e}")
+    async def warm_up(self, systems):
+        """Load the model and evaluate each system prompt once, so the first real
+        request finds both the weights and the prompt prefix already in place."""
+        for kind, system in systems.items():
+            async with self.scheduler.slot("warmup"):
+                started = time.monotonic()
+                resp = await self.client.chat(
+                    model=self.name,
+                    messages=_messages("", system),
+                    options={'num_predict': 1},
+                    keep_alive=OLLAMA_KEEP_ALIVE,
+                )
+            self.timings.record(f"warmup:{kind}", _timings(resp))
+            print(f"Ollama warm-up ({kind}) done in {time.monotonic() - started:.1f}s.")
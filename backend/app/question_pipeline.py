@@ -0,0 +1,183 @@
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# job.status walks through these; "completed" is reached once the rendered video is ready
+QUEUED = "queued"
+TRANSCRIBING = "transcribing"
+THINKING = "thinking"
+RENDERING = "rendering"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class PipelineBusy(RuntimeError):
+    """Raised when a stage queue is full."""
+
+
+@dataclass
+class QuestionJob:
+    user: str
+    voice_id: str
+    # ("talking_photo_id" | "avatar_id" | "photo_url", value), resolved when the job is submitted
+    render_target: Tuple[str, str]
+    audio: Optional[bytes] = None
+    text: Optional[str] = None
+    reply: Optional[str] = None
+    video_id: Optional[str] = None
+    error: Optional[str] = None
+    # chunked mode: one render per sentence group, in playing order
+    # ({"text": ..., "video_id": ..., "error": ...}); video_id is then the first clip
+    chunked: bool = False
+    clips: List[Dict[str, Any]] = field(default_factory=list)
+    clip_tasks: List["asyncio.Task"] = field(default_factory=list, repr=False)
+    status: str = QUEUED
+    job_id: str = field(default_factory=lambda: f"q_{uuid.uuid4().hex}")
+    created_at: float = field(default_factory=time.monotonic)
+    updated_at: float = field(default_factory=time.monotonic)
+    version: int = 0
+    # called after every status change, e.g. to publish the job to other worker processes
+    on_change: Optional[Callable[["QuestionJob"], None]] = field(default=None, repr=False)
+    _changed: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        """Nothing left for the pipeline to do: failed, or handed to the status poller."""
+        return self.status == FAILED or self.video_id is not None
+
+    def set_status(self, status: str, **fields: Any) -> None:
+        for name, value in fields.items():
+            setattr(self, name, value)
+        self.status = status
+        self.version += 1
+        self.updated_at = time.monotonic()
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+        if self.on_change is not None:
+            self.on_change(self)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """What a status reader needs, as plain JSON-able data."""
+        return {
+            "job_id": self.job_id,
+            "user": self.user,
+            "status": self.status,
+            "text": self.text,
+            "reply": self.reply,
+            "video_id": self.video_id,
+            "error": self.error,
+            "chunked": self.chunked,
+            "clips": [dict(clip) for clip in self.clips],
+            "version": self.version,
+        }
+
+    @classmethod
+    def from_snapshot(cls, data: Dict[str, Any]) -> "QuestionJob":
+        """Read-only copy of a job owned by another worker process."""
+        return cls(voice_id="", render_target=("", ""), **data)
+
+    async def wait_changed(self, seen_version: int) -> None:
+        if self.version == seen_version:
+            await self._changed.wait()
+
+
+# a stage returns the job fields it produced, e.g. {"text": ...}
+Stage = Callable[[QuestionJob], Awaitable[Dict[str, Any]]]
+
+
+class QuestionPipeline:
+    """STT -> LLM -> HeyGen as three queued stages with their own workers.
+
+    `submit` only enqueues, so POST /questions can answer with a job id right
+    away. Each stage has a bounded asyncio.Queue and `workers[stage]` tasks,
+    so transcription, generation and render submission scale independently.
+    A job's status is the stage it is queued for or running in. When a stage
+    raises, the job is marked failed; after the render stage it carries a
+    HeyGen video_id and the status poller takes over.
+    """
+
+    def __init__(
+            self,
+            *,
+            transcribe: Stage,
+            think: Stage,
+            render: Stage,
+            workers: Optional[Dict[str, int]] = None,
+            queue_size: int = 64,
+            retention: float = 3600.0,
+    ):
+        workers = workers or {}
+        self._stages: List[Tuple[str, Stage, asyncio.Queue, int]] = [
+            (TRANSCRIBING, transcribe, asyncio.Queue(maxsize=queue_size), max(1, workers.get(TRANSCRIBING, 2))),
+            (THINKING, think, asyncio.Queue(maxsize=queue_size), max(1, workers.get(THINKING, 4))),
+            (RENDERING, render, asyncio.Queue(maxsize=queue_size), max(1, workers.get(RENDERING, 4))),
+        ]
+        self.retention = retention
+        self._jobs: Dict[str, QuestionJob] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        for index, (name, _, _, count) in enumerate(self._stages):
+            for i in range(count):
+                self._tasks.append(asyncio.create_task(self._worker(index), name=f"pipeline-{name}-{i}"))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, job: QuestionJob) -> QuestionJob:
+        self._gc()
+        name, _, q, _ = self._stages[0 if job.audio else 1]
+        try:
+            q.put_nowait(job)
+        except asyncio.QueueFull:
+            raise PipelineBusy("Too many questions in progress, try again in a moment.")
+        job.set_status(name)
+        self._jobs[job.job_id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[QuestionJob]:
+        return self._jobs.get(job_id)
+
+    def stats(self) -> dict:
+        return {
+            "jobs": len(self._jobs),
+            "stages": {
+                name: {"queued": q.qsize(), "workers": count}
+                for name, _, q, count in self._stages
+            },
+        }
+
+    async def _worker(self, index: int) -> None:
+        name, fn, q, _ = self._stages[index]
+        while True:
+            job = await q.get()
+            try:
+                updates = await fn(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                detail = getattr(e, "detail", None) or str(e) or type(e).__name__
+                job.set_status(FAILED, error=str(detail))
+                continue
+            finally:
+                q.task_done()
+
+            if index + 1 < len(self._stages):
+                next_name, _, next_q, _ = self._stages[index + 1]
+                job.set_status(next_name, **updates)
+                await next_q.put(job)
+            else:
+                job.set_status(name, **updates)
+
+    def _gc(self) -> None:
+        now = time.monotonic()
+        stale = [jid for jid, j in self._jobs.items() if j.finished and now - j.updated_at > self.retention]
+        for jid in stale:
+            del self._jobs[jid]
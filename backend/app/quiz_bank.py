@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+import re
+import socket
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+from app.answer_cache import normalize_question
+
+# Subjects the live tutors cover (see the context ids in livechat_create_session_token).
+# "description" is what the bank is pre-warmed with; a request whose description is
+# just the subject ("Math quiz", "quiz de geografie") is served from the same pool.
+SUBJECTS: Dict[str, Dict[str, Any]] = {
+    "it": {
+        "description": "IT / computer science quiz for high school students",
+        "aliases": ("it", "informatica", "computer science", "programming", "programare", "computers"),
+    },
+    "geography": {
+        "description": "Geography quiz for high school students",
+        "aliases": ("geography", "geografie"),
+    },
+    "math": {
+        "description": "Math quiz for high school students",
+        "aliases": ("math", "maths", "mathematics", "matematica", "mate"),
+    },
+    "english": {
+        "description": "English language quiz for high school students",
+        "aliases": ("english", "engleza", "limba engleza"),
+    },
+}
+
+# words that don't change what a quiz is about: "a quiz about math" == "math"
+_FILLER_WORDS = {
+    "a", "an", "the", "quiz", "test", "about", "on", "for", "in", "of", "please",
+    "un", "o", "de", "la", "din", "despre", "grila", "chestionar", "te", "rog",
+}
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS quizzes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    bank_key TEXT NOT NULL,
+    quiz_name TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS quizzes_key ON quizzes (bank_key);
+CREATE TABLE IF NOT EXISTS questions (
+    bank_key TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    body TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (bank_key, text_hash)
+);
+CREATE TABLE IF NOT EXISTS prewarm_claims (
+    bank_key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+def _strip_accents(text: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+
+
+def bank_key_for(description: str) -> str:
+    """Subject id for generic subject quizzes, otherwise the normalized description."""
+    norm = _strip_accents(normalize_question(description))
+    topic = " ".join(w for w in _WORD_RE.findall(norm) if w not in _FILLER_WORDS)
+    for subject, spec in SUBJECTS.items():
+        if topic in spec["aliases"]:
+            return subject
+    return "desc:" + norm
+
+
+class QuizBank:
+    """Persistent store of generated quizzes (SQLite), keyed by `bank_key_for(description)`.
+
+    Questions are pooled per key, so once a key has at least `min_quizzes`
+    quizzes `get()` serves a new quiz instantly by drawing a random subset,
+    in random order, under the title of one of the stored quizzes; until
+    then requests generate fresh quizzes that grow the pool. Entries expire
+    after `ttl_seconds`, so a pool keeps renewing, and it stops growing at
+    `max_questions`. All calls are blocking SQLite I/O.
+    """
+
+    def __init__(self, path: str, max_questions: int = 200, min_quizzes: int = 3,
+                 ttl_seconds: float = 7 * 24 * 3600):
+        self.path = path
+        self.max_questions = max(1, max_questions)
+        self.min_quizzes = max(1, min_quizzes)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        # several worker processes may share the file
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            (count,) = self._db.execute(
+                "SELECT COUNT(*) FROM quizzes WHERE bank_key = ? AND created_at > ?", (key, cutoff)
+            ).fetchone()
+            if count < self.min_quizzes:
+                self.misses += 1
+                return None
+            quiz_name, subject, size = self._db.execute(
+                "SELECT quiz_name, subject, size FROM quizzes WHERE bank_key = ? AND created_at > ?"
+                " ORDER BY RANDOM() LIMIT 1",
+                (key, cutoff),
+            ).fetchone()
+            bodies = self._db.execute(
+                "SELECT body FROM questions WHERE bank_key = ? AND created_at > ? ORDER BY RANDOM() LIMIT ?",
+                (key, cutoff, size),
+            ).fetchall()
+            self.hits += 1
+        return {
+            "quizName": quiz_name,
+            "subject": subject,
+            "questions": [json.loads(body) for (body,) in bodies],
+        }
+
+    def add(self, key: str, quiz: Dict[str, Any]) -> None:
+        questions: List[Dict[str, Any]] = quiz.get("questions") or []
+        if not questions:
+            return
+        now = time.time()
+        with self._lock, self._db:
+            cutoff = now - self.ttl_seconds
+            self._db.execute("DELETE FROM quizzes WHERE bank_key = ? AND created_at <= ?", (key, cutoff))
+            self._db.execute("DELETE FROM questions WHERE bank_key = ? AND created_at <= ?", (key, cutoff))
+            self._db.execute(
+                "INSERT INTO quizzes (bank_key, quiz_name, subject, size, created_at) VALUES (?, ?, ?, ?, ?)",
+                (key, quiz.get("quizName") or "Quiz", quiz.get("subject") or "", len(questions), now),
+            )
+            (pooled,) = self._db.execute("SELECT COUNT(*) FROM questions WHERE bank_key = ?", (key,)).fetchone()
+            for question in questions[:max(0, self.max_questions - pooled)]:
+                text = normalize_question(question.get("questionText") or "")
+                self._db.execute(
+                    "INSERT OR REPLACE INTO questions (bank_key, text_hash, body, created_at) VALUES (?, ?, ?, ?)",
+                    (key, hashlib.sha256(text.encode("utf-8")).hexdigest(), json.dumps(question, ensure_ascii=False), now),
+                )
+
+    def quiz_count(self, key: str) -> int:
+        with self._lock:
+            (count,) = self._db.execute(
+                "SELECT COUNT(*) FROM quizzes WHERE bank_key = ? AND created_at > ?",
+                (key, time.time() - self.ttl_seconds),
+            ).fetchone()
+        return count
+
+    def claim_prewarm(self, key: str, lease_seconds: float = 600.0) -> bool:
+        """Take (or renew) the right to pre-warm `key`, so worker processes sharing the
+        file don't all generate the same quizzes. The lease lapses if its owner dies."""
+        owner = f"{socket.gethostname()}:{os.getpid()}"
+        now = time.time()
+        with self._lock, self._db:
+            # write lock before the read, so two processes can't both see the key unclaimed
+            self._db.execute("BEGIN IMMEDIATE")
+            row = self._db.execute("SELECT owner, expires_at FROM prewarm_claims WHERE bank_key = ?", (key,)).fetchone()
+            if row is not None and row[0] != owner and row[1] > now:
+                return False
+            self._db.execute(
+                "INSERT OR REPLACE INTO prewarm_claims (bank_key, owner, expires_at) VALUES (?, ?, ?)",
+                (key, owner, now + lease_seconds),
+            )
+        return True
+
+    def release_prewarm(self, key: str) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM prewarm_claims WHERE bank_key = ? AND owner = ?",
+                (key, f"{socket.gethostname()}:{os.getpid()}"),
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT bank_key, COUNT(*) FROM questions GROUP BY bank_key"
+            ).fetchall()
+        return {
+            "path": self.path,
+            "keys": len(rows),
+            "questions": {key: count for key, count in rows if not key.startswith("desc:")},
+            "described_questions": sum(count for key, count in rows if key.startswith("desc:")),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,93 @@
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+_QUESTIONS_KEY = re.compile(r'"questions"\s*:\s*\[')
+
+
+class QuizStreamParser:
+    """Pulls question objects out of a quiz JSON document while it is being generated.
+
+    `feed()` accepts the reply token by token and returns the raw JSON text of
+    every element of the "questions" array that has been closed since the
+    last call, so each question can be validated (and shown) on its own.
+    Fields before the array ("quizName", "subject") are available in
+    `header` as soon as the array starts; `finish()` fills in any that came
+    after it.
+    """
+
+    def __init__(self):
+        self.header: Dict[str, Any] = {}
+        self._buf = ""
+        self._pos = -1  # scan position inside the questions array, -1 until it is found
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._item_start = 0
+        self._closed = False
+
+    @property
+    def questions_started(self) -> bool:
+        return self._pos >= 0
+
+    def feed(self, text: str) -> List[str]:
+        self._buf += text
+        if self._pos < 0:
+            m = _QUESTIONS_KEY.search(self._buf)
+            if m is None:
+                return []
+            self._parse_header(self._buf[:m.start()])
+            self._pos = m.end()
+        return self._scan()
+
+    def finish(self) -> Optional[Dict[str, Any]]:
+        """End of reply: the whole document, if it is valid JSON."""
+        try:
+            doc = json.loads(self._buf)
+        except ValueError:
+            return None
+        if isinstance(doc, dict):
+            for key, value in doc.items():
+                if key != "questions":
+                    self.header.setdefault(key, value)
+            return doc
+        return None
+
+    def _parse_header(self, prefix: str) -> None:
+        try:
+            header = json.loads(prefix.rstrip().rstrip(",") + "}")
+        except ValueError:
+            return
+        if isinstance(header, dict):
+            self.header.update(header)
+
+    def _scan(self) -> List[str]:
+        items: List[str] = []
+        buf = self._buf
+        i = self._pos
+        while i < len(buf) and not self._closed:
+            ch = buf[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if self._depth == 0:
+                    self._item_start = i
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 0:
+                    # "]" of the questions array itself
+                    self._closed = True
+                else:
+                    self._depth -= 1
+                    if self._depth == 0:
+                        items.append(buf[self._item_start:i + 1])
+            i += 1
+        self._pos = i
+        return items
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+
+@dataclass
+class RenderEntry:
+    video_id: str
+    created_at: float
+    video_url: Optional[str] = None
+
+
+class RenderCache:
+    """Deduplicates HeyGen renders of identical generate payloads.
+
+    The key is a hash of the full payload (text, character, voice, background,
+    dimension), so any difference yields a fresh render. Concurrent callers
+    with the same payload share a single in-flight submit. Once the status
+    endpoint sees the video completed, the URL is remembered too; failed
+    renders are forgotten so the next identical request retries.
+
+    Callers run in threadpool workers, hence the lock instead of asyncio.
+    """
+
+    def __init__(self, ttl_seconds: float = 24 * 3600, max_entries: int = 2048):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, RenderEntry]" = OrderedDict()
+        self._key_by_video_id: Dict[str, str] = {}
+        self._inflight: Dict[str, Future] = {}
+        self.hits = 0
+        self.coalesced = 0
+        self.misses = 0
+
+    @staticmethod
+    def key_for(payload: dict) -> str:
+        raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get_or_submit(self, payload: dict, submit: Callable[[dict], str]) -> str:
+        """Return the video_id for `payload`, calling `submit` only if nobody else already did."""
+        key = self.key_for(payload)
+        with self._lock:
+            entry = self._get_live(key)
+            if entry is not None:
+                self.hits += 1
+                return entry.video_id
+            pending = self._inflight.get(key)
+            owner = pending is None
+            if owner:
+                pending = Future()
+                self._inflight[key] = pending
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            return pending.result()
+
+        try:
+            video_id = submit(payload)
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            pending.set_exception(e)
+            raise
+
+        with self._lock:
+            self._inflight.pop(key, None)
+            self._entries[key] = RenderEntry(video_id=video_id, created_at=time.time())
+            self._entries.move_to_end(key)
+            self._key_by_video_id[video_id] = key
+            while len(self._entries) > self.max_entries:
+                _, old = self._entries.popitem(last=False)
+                self._key_by_video_id.pop(old.video_id, None)
+        pending.set_result(video_id)
+        return video_id
+
+    def completed_url(self, video_id: str) -> Optional[str]:
+        with self._lock:
+            key = self._key_by_video_id.get(video_id)
+            entry = self._get_live(key) if key else None
+            return entry.video_url if entry else None
+
+    def mark_completed(self, video_id: str, video_url: str) -> None:
+        with self._lock:
+            key = self._key_by_video_id.get(video_id)
+            entry = self._entries.get(key) if key else None
+            if entry is not None:
+                entry.video_url = video_url
+
+    def mark_failed(self, video_id: str) -> None:
+        with self._lock:
+            key = self._key_by_video_id.pop(video_id, None)
+            if key:
+                self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "in_flight": len(self._inflight),
+                "hits": self.hits,
+                "coalesced": self.coalesced,
+                "misses": self.misses,
+            }
+
+    def _get_live(self, key: str) -> Optional[RenderEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry.created_at > self.ttl_seconds:
+            del self._entries[key]
+            self._key_by_video_id.pop(entry.video_id, None)
+            return None
+        self._entries.move_to_end(key)
+        return entry
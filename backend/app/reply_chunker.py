@@ -0,0 +1,56 @@
+import re
+from typing import List, Optional
+
+# sentence end followed by whitespace, or a line break (numbered steps, paragraphs);
+# decimals ("2.5") never match because of the \s+
+_BOUNDARY = re.compile(r"[.!?…]+[\"')\]]*\s+|\n+")
+# "1." at the start of a line is a list marker, not a sentence end
+_LIST_MARKER = re.compile(r"(?:^|\n)[ \t]*\d+$")
+
+
+class SentenceChunker:
+    """Cuts a streamed LLM reply into clip-sized pieces at sentence/step boundaries.
+
+    `feed()` accepts tokens as they arrive and returns every chunk that is
+    complete: at least `min_chars` long and ending on a boundary, so short
+    sentences are merged instead of becoming one-second clips. After
+    `max_chunks - 1` chunks the rest of the reply is kept for `flush()`,
+    which bounds the number of renders per answer.
+    """
+
+    def __init__(self, min_chars: int = 120, max_chunks: int = 6):
+        self.min_chars = max(1, min_chars)
+        self.max_chunks = max(1, max_chunks)
+        self._buffer = ""
+        self._emitted = 0
+
+    def feed(self, text: str) -> List[str]:
+        self._buffer += text
+        chunks: List[str] = []
+        while self._emitted + len(chunks) < self.max_chunks - 1:
+            cut = self._next_cut()
+            if cut is None:
+                break
+            chunk = self._buffer[:cut].strip()
+            self._buffer = self._buffer[cut:]
+            if chunk:
+                chunks.append(chunk)
+        self._emitted += len(chunks)
+        return chunks
+
+    def flush(self) -> Optional[str]:
+        """End of reply: return whatever text is still buffered."""
+        chunk = self._buffer.strip()
+        self._buffer = ""
+        if not chunk:
+            return None
+        self._emitted += 1
+        return chunk
+
+    def _next_cut(self) -> Optional[int]:
+        for m in _BOUNDARY.finditer(self._buffer):
+            if _LIST_MARKER.search(self._buffer, 0, m.start()):
+                continue
+            if len(self._buffer[:m.start()].strip()) >= self.min_chars:
+                return m.end()
+        return None
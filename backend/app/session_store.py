@@ -0,0 +1,172 @@
+import json
+import os
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import redis
+except ImportError:  # optional: only needed for SESSION_STORE=redis://...
+    redis = None
+
+
+class SessionStore(ABC):
+    """Short-lived shared state: per-session selections keyed by a token hash, and the
+    records other worker processes need to see (question jobs, running agents).
+
+    Every value carries an absolute expiry (for sessions, the JWT's exp), after
+    which it is gone. `namespace` separates the kinds of state. The calls are
+    blocking (SQLite/Redis I/O): run them in the threadpool from async code.
+    """
+
+    name = "base"
+    # whether other worker processes see what this one stores
+    shared = True
+
+    @abstractmethod
+    def get(self, namespace: str, key: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def set(self, namespace: str, key: str, value: Dict[str, Any], expires_at: float) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, namespace: str, key: str) -> None:
+        ...
+
+    def stats(self) -> dict:
+        return {"backend": self.name}
+
+
+class MemorySessionStore(SessionStore):
+    """Process-local LRU; only correct with a single worker process."""
+
+    name = "memory"
+    shared = False
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, namespace: str, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._entries[(namespace, key)]
+                return None
+            self._entries.move_to_end((namespace, key))
+            return value
+
+    def set(self, namespace: str, key: str, value: Dict[str, Any], expires_at: float) -> None:
+        with self._lock:
+            self._entries[(namespace, key)] = (expires_at, value)
+            self._entries.move_to_end((namespace, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, namespace: str, key: str) -> None:
+        with self._lock:
+            self._entries.pop((namespace, key), None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"backend": self.name, "entries": len(self._entries), "max_entries": self.max_entries}
+
+
+class SQLiteSessionStore(SessionStore):
+    """Shared by every worker process on the host (WAL mode, one connection per process)."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str, purge_every: int = 500):
+        self.path = path
+        self.purge_every = max(1, purge_every)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        self._db.commit()
+        self._writes = 0
+
+    def get(self, namespace: str, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM sessions WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (namespace, key, time.time()),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, namespace: str, key: str, value: Dict[str, Any], expires_at: float) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, json.dumps(value, ensure_ascii=False), expires_at),
+            )
+            self._writes += 1
+            if self._writes % self.purge_every == 0:
+                self._db.execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),))
+
+    def delete(self, namespace: str, key: str) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM sessions WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def stats(self) -> dict:
+        with self._lock:
+            (entries,) = self._db.execute(
+                "SELECT COUNT(*) FROM sessions WHERE expires_at > ?", (time.time(),)
+            ).fetchone()
+        return {"backend": self.name, "path": self.path, "entries": entries}
+
+
+class RedisSessionStore(SessionStore):
+    """Shared across hosts; Redis expires the keys itself."""
+
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str = "tutorly:session:"):
+        if redis is None:
+            raise RuntimeError("SESSION_STORE is a redis:// URL but the redis package is not installed.")
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{self.prefix}{namespace}:{key}"
+
+    def get(self, namespace: str, key: str) -> Optional[Dict[str, Any]]:
+        raw = self._client.get(self._key(namespace, key))
+        return json.loads(raw) if raw else None
+
+    def set(self, namespace: str, key: str, value: Dict[str, Any], expires_at: float) -> None:
+        ttl = int(expires_at - time.time())
+        if ttl <= 0:
+            return
+        self._client.set(self._key(namespace, key), json.dumps(value, ensure_ascii=False), ex=ttl)
+
+    def delete(self, namespace: str, key: str) -> None:
+        self._client.delete(self._key(namespace, key))
+
+
+def create_session_store(url: str) -> SessionStore:
+    """"memory" (default), "sqlite" / "sqlite:///path/to/sessions.sqlite3", or "redis://host:6379/0"."""
+    url = (url or "memory").strip()
+    if url == "memory":
+        return MemorySessionStore(int(os.getenv("SESSION_STORE_MAX_ENTRIES", "10000")))
+    if url == "sqlite":
+        return SQLiteSessionStore("sessions.sqlite3")
+    if url.startswith("sqlite:///"):
+        return SQLiteSessionStore(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisSessionStore(url)
+    raise ValueError(f"Unknown SESSION_STORE {url!r}; use memory, sqlite[:///path] or redis://...")
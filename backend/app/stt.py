@@ -0,0 +1,257 @@
+import asyncio
+import os
+import queue
+import subprocess
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.stt_engines import SAMPLE_RATE, STTEngine, create_engine
+from app.worker_budget import cpu_share
+
+# STT_ENGINE=whisper (openai-whisper, PyTorch) or faster-whisper (CTranslate2, int8 on CPU)
+STT_ENGINE = os.getenv("STT_ENGINE", "whisper")
+STT_MODEL_SIZE = os.getenv("STT_MODEL_SIZE") or os.getenv("WHISPER_MODEL", "base")
+STT_LANGUAGE = os.getenv("STT_LANGUAGE", "ro")
+
+
+def _default_worker_count() -> int:
+    return max(1, min(cpu_share() // 2, 4))
+
+
+class TranscriptionBusy(RuntimeError):
+    """Raised when the transcription queue is full."""
+
+
+class NoSpeech(RuntimeError):
+    """Raised when the audio was transcribed but contained no words (silence/noise)."""
+
+
+def decode_audio_bytes(data: bytes, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Decode an in-memory upload (webm, ogg, wav, ...) to mono float32 PCM.
+
+    Same conversion as whisper.load_audio, but the bytes are piped into
+    ffmpeg's stdin instead of going through a temporary file.
+    """
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0",
+        "-i", "pipe:0",
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate),
+        "-loglevel", "error",
+        "pipe:1",
+    ]
+    try:
+        proc = subprocess.run(cmd, input=data, capture_output=True, check=True)
+    except FileNotFoundError:
+        raise RuntimeError("ffmpeg is not installed.")
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to decode audio: {e.stderr.decode(errors='ignore').strip()}")
+    return np.frombuffer(proc.stdout, np.int16).astype(np.float32) / 32768.0
+
+
+def _to_array(audio: Any) -> np.ndarray:
+    if isinstance(audio, (bytes, bytearray)):
+        return decode_audio_bytes(audio)
+    if isinstance(audio, str):
+        with open(audio, "rb") as f:
+            return decode_audio_bytes(f.read())
+    return audio
+
+
+@dataclass
+class _Job:
+    audio: Any
+    language: str
+    future: Future = field(default_factory=Future)
+
+
+class TranscriptionPool:
+    """Dedicated transcription threads, each with its own STT engine instance.
+
+    Whisper installs kv-cache hooks on the model while decoding, so one model
+    instance cannot serve two transcriptions at once; every worker owns one.
+    The engines release the GIL inside their kernels, so the workers really
+    run in parallel and the CPU cores are split evenly between them.
+
+    Jobs wait in a bounded queue: when it is full `submit` raises
+    TranscriptionBusy instead of piling up more work. Workers (and their
+    models) are started by `start()`, or lazily by the first submit.
+
+    A worker that picks up a job keeps collecting queued jobs for up to
+    `batch_window` seconds (at most `max_batch`). Clips the engine can batch
+    (30 s or less for openai-whisper) that share a language are decoded in
+    one forward pass; the rest are transcribed one by one.
+    """
+
+    def __init__(
+            self,
+            engine: str = STT_ENGINE,
+            model_size: str = STT_MODEL_SIZE,
+            workers: Optional[int] = None,
+            queue_size: int = 16,
+            language: str = STT_LANGUAGE,
+            batch_window: float = 0.02,
+            max_batch: int = 8,
+    ):
+        self.engine = engine
+        self.model_size = model_size
+        self.workers = max(1, workers or _default_worker_count())
+        self.language = language
+        self.batch_window = max(0.0, batch_window)
+        self.max_batch = max(1, max_batch)
+        self._queue: "queue.Queue[_Job]" = queue.Queue(maxsize=max(1, queue_size))
+        # with several worker processes each one only splits its own share of the cores
+        cpu_threads = max(1, cpu_share() // self.workers)
+        self._engines: List[STTEngine] = [
+            create_engine(engine, model_size, cpu_threads=cpu_threads) for _ in range(self.workers)
+        ]
+        self._lock = threading.Lock()
+        self._started = False
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.batches = 0
+        self.batched_jobs = 0
+
+    @property
+    def ready(self) -> bool:
+        return any(engine.ready for engine in self._engines)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for i, engine in enumerate(self._engines):
+            threading.Thread(target=self._worker, args=(engine,), name=f"stt-worker-{i}", daemon=True).start()
+
+    def submit(self, audio: Any, language: Optional[str] = None) -> Future:
+        self.start()
+        job = _Job(audio=audio, language=language or self.language)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self.rejected += 1
+            raise TranscriptionBusy("Too many voice questions in progress, try again in a moment.")
+        return job.future
+
+    async def transcribe(self, audio: Any, language: Optional[str] = None, timeout: Optional[float] = None) -> str:
+        fut = self.submit(audio, language)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(fut), timeout)
+        except asyncio.TimeoutError:
+            # drops the job if it is still queued; a running decode cannot be interrupted
+            fut.cancel()
+            self.timed_out += 1
+            raise
+
+    def status(self) -> dict:
+        errors = [engine.error for engine in self._engines if engine.error]
+        return {
+            "engine": self.engine,
+            "model": self.model_size,
+            "language": self.language,
+            "ready": self.ready,
+            "workers": self.workers,
+            "ready_workers": sum(1 for engine in self._engines if engine.ready),
+            "device": next((engine.device for engine in self._engines if engine.device), None),
+            "queued": self._queue.qsize(),
+            "queue_size": self._queue.maxsize,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "batches": self.batches,
+            "avg_batch_size": round(self.batched_jobs / self.batches, 2) if self.batches else None,
+            "error": errors[0] if errors else None,
+        }
+
+    def _worker(self, engine: STTEngine) -> None:
+        try:
+            engine.load()
+        except Exception as e:
+            print(f"[WARN] STT engine failed to load: {e}")
+
+        while True:
+            jobs = [job for job in self._next_batch() if job.future.set_running_or_notify_cancel()]
+            if not jobs:
+                continue
+            try:
+                engine.load()
+            except BaseException as e:
+                for job in jobs:
+                    self._fail(job, e)
+                continue
+            self._run_batch(engine, jobs)
+
+    def _next_batch(self) -> List[_Job]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_batch(self, engine: STTEngine, jobs: List[_Job]) -> None:
+        decoded = []
+        for job in jobs:
+            try:
+                decoded.append((job, _to_array(job.audio)))
+            except BaseException as e:
+                self._fail(job, e)
+
+        batchable: Dict[str, list] = defaultdict(list)
+        for job, audio in decoded:
+            if not audio.size:
+                self._resolve(job, "")
+            elif engine.can_batch(audio):
+                batchable[job.language].append((job, audio))
+            else:
+                self._run_one(engine, job, audio)
+
+        for language, group in batchable.items():
+            if len(group) == 1:
+                self._run_one(engine, *group[0])
+                continue
+            try:
+                texts = engine.transcribe_batch([audio for _, audio in group], language)
+            except Exception as e:
+                print(f"[WARN] Batched transcription failed, falling back to one by one: {e}")
+                for job, audio in group:
+                    self._run_one(engine, job, audio)
+                continue
+            self.batches += 1
+            self.batched_jobs += len(group)
+            for (job, _), text in zip(group, texts):
+                self._resolve(job, text)
+
+    def _run_one(self, engine: STTEngine, job: _Job, audio: np.ndarray) -> None:
+        try:
+            text = engine.transcribe(audio, job.language)
+        except BaseException as e:
+            self._fail(job, RuntimeError(f"{engine.name} error: {e}"))
+        else:
+            self._resolve(job, text)
+
+    def _resolve(self, job: _Job, text: str) -> None:
+        if not text:
+            self._fail(job, NoSpeech("No speech recognized from audio."))
+            return
+        self.completed += 1
+        job.future.set_result(text)
+
+    def _fail(self, job: _Job, error: BaseException) -> None:
+        self.failed += 1
+        job.future.set_exception(error)
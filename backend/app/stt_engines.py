@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Type
+
+import numpy as np
+
+# Whisper models expect 16 kHz mono and decode fixed 30 s windows
+SAMPLE_RATE = 16000
+N_SAMPLES = 30 * SAMPLE_RATE
+
+
+class STTEngine(ABC):
+    """One loaded speech-to-text model, owned by a single STT worker.
+
+    Subclasses implement `_load_model` and `transcribe`. Engines that can
+    decode several clips in one forward pass override `can_batch` and
+    `transcribe_batch`.
+    """
+
+    name = ""
+
+    def __init__(self, model_size: str = "base", cpu_threads: int = 0):
+        self.model_size = model_size
+        self.cpu_threads = cpu_threads
+        self.device: Optional[str] = None
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self._model: Any = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._model is not None
+
+    def load(self) -> None:
+        with self._lock:
+            if self._model is not None:
+                return
+            started = time.monotonic()
+            print(f"=== LOAD STT ({self.name}, {self.model_size}) ===")
+            try:
+                self._model = self._load_model()
+            except Exception as e:
+                self.error = f"{type(e).__name__}: {e}"
+                raise
+            self.error = None
+            self.load_seconds = round(time.monotonic() - started, 2)
+            print(f"STT model loaded in {self.load_seconds}s.")
+
+    @abstractmethod
+    def _load_model(self) -> Any:
+        ...
+
+    @abstractmethod
+    def transcribe(self, audio: np.ndarray, language: str) -> str:
+        ...
+
+    def can_batch(self, audio: np.ndarray) -> bool:
+        return False
+
+    def transcribe_batch(self, audios: List[np.ndarray], language: str) -> List[str]:
+        return [self.transcribe(audio, language) for audio in audios]
+
+
+class WhisperEngine(STTEngine):
+    """openai-whisper on PyTorch (float32 on CPU, fp16 on CUDA)."""
+
+    name = "whisper"
+
+    def _load_model(self) -> Any:
+        import torch
+        import whisper
+
+        # imported and sized here, on the STT worker thread, not on startup or the event loop;
+        # the intra-op pool is process-wide, so every worker sets the same share
+        if self.cpu_threads:
+            torch.set_num_threads(self.cpu_threads)
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        return whisper.load_model(self.model_size, device=self.device)
+
+    def transcribe(self, audio: np.ndarray, language: str) -> str:
+        result = self._model.transcribe(audio, language=language)
+        return (result.get("text") or "").strip()
+
+    def can_batch(self, audio: np.ndarray) -> bool:
+        return audio.shape[-1] <= N_SAMPLES
+
+    def transcribe_batch(self, audios: List[np.ndarray], language: str) -> List[str]:
+        """One padded forward pass for several clips of at most 30 s each."""
+        import torch
+        import whisper
+
+        model = self._model
+        n_mels = getattr(model.dims, "n_mels", 80)
+        mel = torch.stack([whisper.log_mel_spectrogram(whisper.pad_or_trim(a), n_mels=n_mels) for a in audios])
+        options = whisper.DecodingOptions(
+            language=language,
+            without_timestamps=True,
+            fp16=model.device.type == "cuda",
+        )
+        results = whisper.decode(model, mel.to(model.device), options)
+        return [r.text.strip() for r in results]
+
+
+class FasterWhisperEngine(STTEngine):
+    """CTranslate2 Whisper (faster-whisper), int8-quantized on CPU by default.
+
+    Optional dependency: `pip install faster-whisper`. STT_COMPUTE_TYPE picks
+    the quantization (int8, int8_float16, float16, float32).
+    """
+
+    name = "faster-whisper"
+
+    def __init__(self, model_size: str = "base", cpu_threads: int = 0):
+        super().__init__(model_size, cpu_threads)
+        self.compute_type = os.getenv("STT_COMPUTE_TYPE", "int8")
+        self.beam_size = int(os.getenv("STT_BEAM_SIZE", "1"))
+
+    def _load_model(self) -> Any:
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError:
+            raise RuntimeError("STT_ENGINE=faster-whisper requires `pip install faster-whisper`.")
+
+        self.device = os.getenv("STT_DEVICE", "cpu")
+        return WhisperModel(
+            self.model_size,
+            device=self.device,
+            compute_type=self.compute_type,
+            cpu_threads=self.cpu_threads,
+        )
+
+    def transcribe(self, audio: np.ndarray, language: str) -> str:
+        segments, _info = self._model.transcribe(audio, language=language, beam_size=self.beam_size)
+        return "".join(segment.text for segment in segments).strip()
+
+
+ENGINES: Dict[str, Type[STTEngine]] = {
+    WhisperEngine.name: WhisperEngine,
+    FasterWhisperEngine.name: FasterWhisperEngine,
+}
+
+
+def create_engine(name: str, model_size: str, cpu_threads: int = 0) -> STTEngine:
+    try:
+        engine_cls = ENGINES[name]
+    except KeyError:
+        raise ValueError(f"Unknown STT engine {name!r}, expected one of: {', '.join(ENGINES)}")
+    return engine_cls(model_size=model_size, cpu_threads=cpu_threads)
@@ -0,0 +1,118 @@
+from typing import List, Optional
+
+import numpy as np
+
+try:
+    import webrtcvad
+except ImportError:
+    webrtcvad = None
+
+
+class EnergyVAD:
+    """Frame-level speech detector for 16 kHz float32 PCM.
+
+    Uses webrtcvad when it is installed; otherwise compares each frame's RMS
+    energy against an adaptive noise floor (an exponential average of the
+    frames judged to be silence).
+    """
+
+    def __init__(self, sample_rate: int = 16000, aggressiveness: int = 2,
+                 min_rms: float = 0.01, ratio: float = 3.0):
+        self.sample_rate = sample_rate
+        self.min_rms = min_rms
+        self.ratio = ratio
+        self.noise_floor = min_rms / ratio
+        self._webrtc = webrtcvad.Vad(aggressiveness) if webrtcvad is not None else None
+
+    def is_speech(self, frame: np.ndarray) -> bool:
+        if self._webrtc is not None:
+            pcm16 = (np.clip(frame, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+            return self._webrtc.is_speech(pcm16, self.sample_rate)
+
+        rms = float(np.sqrt(np.mean(frame * frame))) if frame.size else 0.0
+        speech = rms > max(self.min_rms, self.noise_floor * self.ratio)
+        if not speech:
+            self.noise_floor = 0.95 * self.noise_floor + 0.05 * rms
+        return speech
+
+
+class SpeechSegmenter:
+    """Cuts a live PCM stream into utterances at pauses.
+
+    `feed()` accepts arbitrary-sized chunks and returns every segment that
+    ended with at least `silence_ms` of silence (or reached `max_segment_s`,
+    which stays under Whisper's 30 s window). A short pre-roll is kept so
+    the first syllable isn't clipped; blips shorter than `min_speech_ms`
+    are dropped.
+    """
+
+    def __init__(self, sample_rate: int = 16000, frame_ms: int = 30, silence_ms: int = 500,
+                 min_speech_ms: int = 250, pre_roll_ms: int = 200, max_segment_s: float = 25.0,
+                 vad: Optional[EnergyVAD] = None):
+        self.sample_rate = sample_rate
+        self.frame = sample_rate * frame_ms // 1000
+        self.silence_frames = max(1, silence_ms // frame_ms)
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.pre_roll_frames = max(0, pre_roll_ms // frame_ms)
+        self.max_segment_frames = int(max_segment_s * 1000 // frame_ms)
+        self.vad = vad or EnergyVAD(sample_rate)
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._pre_roll: List[np.ndarray] = []
+        self._segment: List[np.ndarray] = []
+        self._speech_frames = 0
+        self._silent_run = 0
+
+    @property
+    def in_speech(self) -> bool:
+        return bool(self._segment)
+
+    def feed(self, pcm: np.ndarray) -> List[np.ndarray]:
+        self._pending = np.concatenate([self._pending, pcm.astype(np.float32, copy=False)])
+        n_frames = len(self._pending) // self.frame
+        frames = [self._pending[i * self.frame:(i + 1) * self.frame] for i in range(n_frames)]
+        self._pending = self._pending[n_frames * self.frame:]
+
+        done: List[np.ndarray] = []
+        for frame in frames:
+            segment = self._push(frame)
+            if segment is not None:
+                done.append(segment)
+        return done
+
+    def flush(self) -> Optional[np.ndarray]:
+        """End of stream: return whatever speech is still buffered."""
+        if self._pending.size and self._segment:
+            self._segment.append(self._pending)
+        self._pending = np.zeros(0, dtype=np.float32)
+        return self._close()
+
+    def _push(self, frame: np.ndarray) -> Optional[np.ndarray]:
+        speech = self.vad.is_speech(frame)
+        if not self._segment:
+            if speech:
+                self._segment = self._pre_roll + [frame]
+                self._pre_roll = []
+                self._speech_frames = 1
+                self._silent_run = 0
+            else:
+                self._pre_roll.append(frame)
+                if len(self._pre_roll) > self.pre_roll_frames:
+                    self._pre_roll.pop(0)
+            return None
+
+        self._segment.append(frame)
+        if speech:
+            self._speech_frames += 1
+            self._silent_run = 0
+        else:
+            self._silent_run += 1
+        if self._silent_run >= self.silence_frames or len(self._segment) >= self.max_segment_frames:
+            return self._close()
+        return None
+
+    def _close(self) -> Optional[np.ndarray]:
+        segment, speech_frames = self._segment, self._speech_frames
+        self._segment, self._speech_frames, self._silent_run = [], 0, 0
+        if not segment or speech_frames < self.min_speech_frames:
+            return None
+        return np.concatenate(segment)
@@ -0,0 +1,44 @@
+import os
+from typing import Optional
+
+# Resident memory of one loaded STT model instance, in MB (rough, measured on CPU).
+# STT_MODEL_MEMORY_MB overrides the table for models/quantizations not listed here.
+_MODEL_MEMORY_MB = {
+    "whisper": {"tiny": 250, "base": 400, "small": 1000, "medium": 2600, "large": 4800, "turbo": 1800},
+    "faster-whisper": {"tiny": 100, "base": 150, "small": 350, "medium": 900, "large": 1700, "turbo": 900},
+}
+# interpreter, FastAPI, numpy, HTTP pools, caches
+_BASE_MEMORY_MB = 300
+
+
+def process_count() -> int:
+    """How many worker processes serve the app on this host (gunicorn.conf.py exports it)."""
+    try:
+        return max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+    except ValueError:
+        return 1
+
+
+def cpu_share() -> int:
+    """Cores this process may use when every worker process gets an equal slice."""
+    return max(1, (os.cpu_count() or 1) // process_count())
+
+
+def stt_model_memory_mb(engine: str, model_size: str) -> int:
+    override = os.getenv("STT_MODEL_MEMORY_MB")
+    if override:
+        return int(override)
+    sizes = _MODEL_MEMORY_MB.get(engine, _MODEL_MEMORY_MB["whisper"])
+    family = model_size.split(".")[0].split("-")[0]  # "large-v3" -> "large", "base.en" -> "base"
+    return sizes.get(family, sizes["large"])
+
+
+def stt_workers_for_budget(memory_mb: int, engine: str, model_size: str, cap: Optional[int] = None) -> int:
+    """Number of STT model instances (one per transcription thread) that fit in `memory_mb`."""
+    per_model = stt_model_memory_mb(engine, model_size)
+    fits = (memory_mb - _BASE_MEMORY_MB) // per_model
+    if fits < 1:
+        print(f"[WARN] WORKER_MEMORY_MB={memory_mb} is below one {engine}:{model_size} model "
+              f"(~{per_model + _BASE_MEMORY_MB} MB); running a single STT worker anyway.")
+    workers = max(1, int(fits))
+    return min(workers, cap) if cap else workers
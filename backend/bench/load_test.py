@@ -0,0 +1,169 @@
+"""Measure how request throughput scales with the number of worker processes.
+
+For every --workers value the script starts gunicorn (gunicorn.conf.py) with
+that many workers, waits for /health, logs in and runs --concurrency clients
+for --duration seconds against one scenario:
+
+    health    GET /health                                  (framework overhead)
+    chat      POST /chat with a fixed question             (answer-cache hits after the first)
+    quiz      POST /quiz "Math quiz"                       (quiz bank hits once pre-warmed)
+    session   POST then GET /api/session/selection         (shared session store; a 404 is an error)
+
+Run from backend/ (HEYGEN_API_KEY etc. must be set, as for the app itself):
+
+    python -m bench.load_test --workers 1,2,4,8 --scenario chat --concurrency 64 --duration 20
+
+With --url the script targets an already running server and --workers is ignored.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+from typing import List, Optional
+
+import httpx
+
+SELECTION = {
+    "avatar": {"id": "bench-avatar", "name": "Bench"},
+    "voice": {"id": "bench-voice", "name": "Bench"},
+}
+
+
+async def _login(client: httpx.AsyncClient, user: str, password: str) -> str:
+    resp = await client.post("/auth/login", json={"username": user, "password": password})
+    resp.raise_for_status()
+    return resp.json()["access_token"]
+
+
+async def _one_request(client: httpx.AsyncClient, scenario: str, headers: dict) -> bool:
+    if scenario == "health":
+        resp = await client.get("/health")
+    elif scenario == "chat":
+        resp = await client.post("/chat", json={"text": "2+2"}, headers=headers)
+    elif scenario == "quiz":
+        resp = await client.post("/quiz", json={"description": "Math quiz"})
+    elif scenario == "session":
+        resp = await client.post("/api/session/selection", json=SELECTION, headers=headers)
+        if resp.is_success:
+            resp = await client.get("/api/session/selection", headers=headers)
+    else:
+        raise ValueError(f"Unknown scenario {scenario!r}")
+    return resp.is_success
+
+
+async def run_load(url: str, scenario: str, concurrency: int, duration: float, user: str, password: str) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=120) as client:
+        token = await _login(client, user, password)
+        headers = {"Authorization": f"Bearer {token}"}
+        # one warm-up request fills the answer cache / checks the scenario works
+        await _one_request(client, scenario, headers)
+
+        latencies: List[float] = []
+        errors = 0
+        deadline = time.monotonic() + duration
+
+        async def _client_loop():
+            nonlocal errors
+            while time.monotonic() < deadline:
+                started = time.monotonic()
+                try:
+                    ok = await _one_request(client, scenario, headers)
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append(time.monotonic() - started)
+                errors += not ok
+
+        started = time.monotonic()
+        await asyncio.gather(*[_client_loop() for _ in range(concurrency)])
+        elapsed = time.monotonic() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else None,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else None,
+    }
+
+
+def _start_server(workers: int, port: int) -> subprocess.Popen:
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), BIND=f"127.0.0.1:{port}")
+    # the benchmark measures the API, not model loading
+    env.setdefault("STT_PRELOAD", "0")
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:app"],
+        env=env,
+        start_new_session=True,
+    )
+
+
+def _wait_ready(url: str, timeout: float = 120.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}/health", timeout=2).is_success:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server at {url} did not become ready within {timeout:.0f}s")
+
+
+def _stop_server(proc: subprocess.Popen) -> None:
+    os.killpg(proc.pid, signal.SIGTERM)
+    try:
+        proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        os.killpg(proc.pid, signal.SIGKILL)
+
+
+def _print_row(label: str, result: dict, baseline: Optional[float]) -> None:
+    scaling = f"{result['rps'] / baseline:5.2f}x" if baseline else "    - "
+    print(f"{label:>8}  {result['requests']:>8}  {result['errors']:>6}  {result['rps']:>8.1f}  "
+          f"{result['p50_ms']:>8.1f}  {result['p95_ms']:>8.1f}  {scaling}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts to compare")
+    parser.add_argument("--scenario", default="chat", choices=["health", "chat", "quiz", "session"])
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per run")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--url", help="benchmark a running server instead of starting gunicorn")
+    parser.add_argument("--user", default="Student")
+    parser.add_argument("--password", default="parola123")
+    args = parser.parse_args()
+
+    print(f"scenario={args.scenario} concurrency={args.concurrency} duration={args.duration:.0f}s "
+          f"cores={os.cpu_count()}")
+    print(f"{'workers':>8}  {'requests':>8}  {'errors':>6}  {'req/s':>8}  {'p50 ms':>8}  {'p95 ms':>8}  scaling")
+
+    if args.url:
+        result = asyncio.run(run_load(args.url, args.scenario, args.concurrency, args.duration,
+                                      args.user, args.password))
+        _print_row("-", result, None)
+        return
+
+    baseline = None
+    for workers in [int(w) for w in args.workers.split(",") if w.strip()]:
+        url = f"http://127.0.0.1:{args.port}"
+        proc = _start_server(workers, args.port)
+        try:
+            _wait_ready(url)
+            result = asyncio.run(run_load(url, args.scenario, args.concurrency, args.duration,
+                                          args.user, args.password))
+        finally:
+            _stop_server(proc)
+        baseline = baseline or result["rps"]
+        _print_row(str(workers), result, baseline)
+
+
+if __name__ == "__main__":
+    main()
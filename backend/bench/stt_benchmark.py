@@ -0,0 +1,133 @@
+"""Compare STT engines on a fixed audio set: latency, real-time factor and WER.
+
+Manifest: a UTF-8 TSV file, one `audio_path<TAB>reference transcript` per line
+(paths relative to the manifest). Any ffmpeg-readable format works. A Common
+Voice TSV (e.g. `ro/validated.tsv` or `test.tsv`) can be passed as is: its
+`path` and `sentence` columns are picked by header name and the clips are read
+from `clips/` next to it.
+
+Run from backend/:
+
+    python -m bench.stt_benchmark data/ro/manifest.tsv \
+        --engine whisper:base --engine faster-whisper:base --language ro
+
+Set STT_COMPUTE_TYPE (default int8) to choose the faster-whisper quantization.
+"""
+import argparse
+import os
+import re
+import statistics
+import sys
+import time
+import unicodedata
+from typing import List, Tuple
+
+from app.stt import decode_audio_bytes
+from app.stt_engines import SAMPLE_RATE, create_engine
+
+_PUNCT_RE = re.compile(r"[^\w\s]")
+# Romanian comma-below vs. legacy cedilla forms count as the same letter
+_DIACRITICS = str.maketrans({"ş": "ș", "ţ": "ț", "Ş": "Ș", "Ţ": "Ț"})
+
+
+def normalize_words(text: str) -> List[str]:
+    text = unicodedata.normalize("NFC", text).translate(_DIACRITICS).lower()
+    return _PUNCT_RE.sub(" ", text).split()
+
+
+def word_errors(reference: List[str], hypothesis: List[str]) -> int:
+    """Levenshtein distance over words (substitutions + insertions + deletions)."""
+    prev = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        cur = [i] + [0] * len(hypothesis)
+        for j, hyp_word in enumerate(hypothesis, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ref_word != hyp_word))
+        prev = cur
+    return prev[-1]
+
+
+def load_manifest(path: str) -> List[Tuple[str, str]]:
+    base = os.path.dirname(os.path.abspath(path))
+    items = []
+    with open(path, encoding="utf-8") as f:
+        columns = None
+        for line in f:
+            line = line.rstrip("\n")
+            if not line or line.startswith("#"):
+                continue
+            fields = line.split("\t")
+            if columns is None and not items and {"path", "sentence"} <= set(fields):
+                # Common Voice header: the column order differs between releases
+                columns = (fields.index("path"), fields.index("sentence"))
+                base = os.path.join(base, "clips")
+                continue
+            if columns is not None:
+                audio_path, reference = fields[columns[0]], fields[columns[1]]
+            else:
+                audio_path, _, reference = line.partition("\t")
+            items.append((os.path.join(base, audio_path), reference))
+    return items
+
+
+def run_engine(spec: str, samples, language: str, threads: int) -> dict:
+    name, _, size = spec.partition(":")
+    engine = create_engine(name, size or "base", cpu_threads=threads)
+    engine.load()
+
+    # warm-up so one-time allocations don't land in the first measurement
+    engine.transcribe(samples[0][0], language)
+
+    latencies, audio_seconds, errors, ref_words = [], 0.0, 0, 0
+    for audio, reference in samples:
+        started = time.perf_counter()
+        text = engine.transcribe(audio, language)
+        latencies.append(time.perf_counter() - started)
+        audio_seconds += len(audio) / SAMPLE_RATE
+        ref = normalize_words(reference)
+        errors += word_errors(ref, normalize_words(text))
+        ref_words += len(ref)
+
+    latencies.sort()
+    return {
+        "engine": spec,
+        "load_s": engine.load_seconds,
+        "mean_s": statistics.mean(latencies),
+        "p50_s": latencies[len(latencies) // 2],
+        "p95_s": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        "rtf": sum(latencies) / audio_seconds if audio_seconds else 0.0,
+        "wer": errors / ref_words if ref_words else 0.0,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("manifest")
+    parser.add_argument("--engine", action="append", dest="engines",
+                        help="engine[:model_size], repeatable (default: whisper:base, faster-whisper:base)")
+    parser.add_argument("--language", default="ro")
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+
+    items = load_manifest(args.manifest)
+    if not items:
+        print("Empty manifest.", file=sys.stderr)
+        return 1
+    samples = []
+    for audio_path, reference in items:
+        with open(audio_path, "rb") as f:
+            samples.append((decode_audio_bytes(f.read()), reference))
+    total = sum(len(a) for a, _ in samples) / SAMPLE_RATE
+    print(f"{len(samples)} clips, {total:.1f}s of audio, language={args.language}\n")
+
+    rows = [run_engine(spec, samples, args.language, args.threads)
+            for spec in (args.engines or ["whisper:base", "faster-whisper:base"])]
+
+    print(f"{'engine':<28}{'load s':>8}{'mean s':>9}{'p50 s':>8}{'p95 s':>8}{'RTF':>7}{'WER':>8}")
+    for r in rows:
+        print(f"{r['engine']:<28}{r['load_s']:>8.2f}{r['mean_s']:>9.3f}{r['p50_s']:>8.3f}"
+              f"{r['p95_s']:>8.3f}{r['rtf']:>7.3f}{r['wer'] * 100:>7.1f}%")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
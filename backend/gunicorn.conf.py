@@ -0,0 +1,47 @@
+"""Multi-worker deployment. Run from backend/:
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+Environment:
+    WEB_CONCURRENCY    worker processes (default: one per core)
+    WORKER_MEMORY_MB   per-worker budget for STT models (sizes STT_WORKERS, see app/worker_budget.py)
+    WORKER_PIN_CPUS=1  give every worker its own slice of the cores
+    SESSION_STORE      defaults to sqlite with more than one worker, so sessions,
+                       question jobs and agents are visible from every worker
+    AGENT_BACKEND=workers  LiveAvatar agents run in their own pool instead of the API
+                       workers (`python -m app.agent_worker`, see app/agent_worker.py)
+
+Limits: the HeyGen status poller and the render cache stay per process, so every
+worker asked about a video polls HeyGen for it itself (at most once per poll
+interval per worker), and a render is only deduplicated within one worker.
+"""
+import multiprocessing
+import os
+
+workers = int(os.getenv("WEB_CONCURRENCY") or multiprocessing.cpu_count())
+# exported so each worker splits the cores (STT threads) and OLLAMA_NUM_PARALLEL with its siblings
+os.environ["WEB_CONCURRENCY"] = str(workers)
+if workers > 1:
+    os.environ.setdefault("SESSION_STORE", "sqlite")
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+worker_class = "uvicorn.workers.UvicornWorker"
+# the app is imported after the fork: torch threads, the Ollama client and the
+# SQLite connections must not be shared between processes
+preload_app = False
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+# recycle workers after this many requests to bound memory growth (0 = never)
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+
+
+def post_fork(server, worker):
+    if os.getenv("WORKER_PIN_CPUS") != "1" or not hasattr(os, "sched_setaffinity"):
+        return
+    cores = sorted(os.sched_getaffinity(0))
+    share = max(1, len(cores) // workers)
+    # age counts every spawn, so a respawned worker takes over a free-ish slot
+    slot = (worker.age - 1) % max(1, len(cores) // share)
+    os.sched_setaffinity(0, cores[slot * share:(slot + 1) * share])